@@ -27,6 +27,11 @@ class OrderInlines(admin.TabularInline):
 
 class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderInlines]  
+    readonly_fields = ('total_price', 'total_quantity')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.recalculate_totals()
 
 admin.site.register(Order, OrderAdmin)
 admin.site.register(User, UserAdmin)
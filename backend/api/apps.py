@@ -5,7 +5,15 @@ class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
 
-    # def ready(self):
-    #     from . import signals
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import signals
+        from .budgets import install_query_counter
+        from .search import install_fts
+
+        post_migrate.connect(install_fts, sender=self)
+        connection_created.connect(install_query_counter)
         
 
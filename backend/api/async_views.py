@@ -0,0 +1,220 @@
+"""
+Async counterparts of the hottest read endpoints, for ASGI workers (``drf_course.asgi``).
+They use Django's async ORM, so a slow client holds a coroutine rather than a thread, and
+they answer with the same JSON as the DRF views they mirror.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import condition, require_GET
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from api.budgets import query_budget
+from api.cache import last_writes, order_cache, product_cache, set_validators, validators
+from api.dashboard import (
+    LIST_LENGTH,
+    assemble_dashboard,
+    dashboard_etag,
+    low_stock_products,
+    product_counts,
+    recent_orders,
+)
+from api.filter import OrderFilter, ProductFilter
+from api.models import Customer, Order, Product
+from api.renderers import encode
+from api.rollups import revenue_months, top_selling_products
+from api.search import product_search
+from api.serializers import OrderSerializer, OrderSummarySerializer, ProductSerializer
+
+PRODUCT_ORDERING_FIELDS = ('name', 'price', 'stock')
+ORDER_LIST_VIEWS = ('full', 'summary', 'count')
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+def json_response(data, status=200):
+    # The renderers' encoder, so decimals, dates and UUIDs come out exactly as the sync views render them.
+    return HttpResponse(encode(data), status=status, content_type='application/json')
+
+
+def versioned(*caches):
+    """
+    ConditionalGetMixin for async views: validators from the newest write to the tables of
+    ``caches``, read with one async query, and a 304 without running the view when they match.
+    """
+    models = dict.fromkeys(model for namespace in caches for model in namespace.models)
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            changed = [at async for at in last_writes(models)]
+            parts = [request.build_absolute_uri(), timezone.get_current_timezone_name()]
+            etag, last_modified = validators(changed, parts)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+async def authenticated_user(request):
+    """The session user, else the JWT bearer's, else None; the same classes DRF is configured with."""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    return result[0] if result else None
+
+
+def authentication_required(view):
+    """IsAuthenticated for async views, checked before anything else (including conditional GET)."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if await authenticated_user(request) is None:
+            response = json_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+            response['WWW-Authenticate'] = 'Bearer realm="api"'
+            return response
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def not_found(detail):
+    return json_response({'detail': detail}, status=404)
+
+
+def rejects_keyset(request):
+    if 'cursor' in request.GET or request.GET.get('paginate') == 'cursor':
+        return json_response({'paginate': 'Keyset pages are only served by the synchronous endpoints.'}, status=400)
+    return None
+
+
+async def page_number_page(request, queryset):
+    """PageNumberPagination's response for ``?page=``, with the count and the page fetched together."""
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    number = request.GET.get('page', '1')
+    if not number.isdigit() or int(number) < 1:
+        return None
+    number = int(number)
+    count, rows = await asyncio.gather(
+        queryset.acount(), alist(queryset[(number - 1) * page_size:number * page_size])
+    )
+    if number > 1 and (number - 1) * page_size >= count:
+        return None
+    url = request.build_absolute_uri()
+    return count, rows, {
+        'next': replace_query_param(url, 'page', number + 1) if number * page_size < count else None,
+        'previous': None if number == 1 else (
+            remove_query_param(url, 'page') if number == 2 else replace_query_param(url, 'page', number - 1)
+        ),
+    }
+
+
+async def limit_offset_page(request, queryset):
+    """LimitOffsetPagination's response for ``?limit=&offset=``; the links come from DRF itself."""
+    paginator = LimitOffsetPagination()
+    drf_request = Request(request)
+    paginator.request = drf_request
+    paginator.limit = paginator.get_limit(drf_request)
+    paginator.offset = paginator.get_offset(drf_request)
+    paginator.count, rows = await asyncio.gather(
+        queryset.acount(), alist(queryset[paginator.offset:paginator.offset + paginator.limit])
+    )
+    return paginator.count, rows, {'next': paginator.get_next_link(), 'previous': paginator.get_previous_link()}
+
+
+@query_budget(3)  # the validators' newest-write lookup, then count and page
+@require_GET
+@versioned(product_cache)
+async def product_list(request):
+    """GET /products/ without the response cache: ProductFilter, ``?search=``, ``?ordering=`` and ``?page=``."""
+    if response := rejects_keyset(request):
+        return response
+    filterset = ProductFilter(request.GET, queryset=Product.objects.all())
+    if not filterset.is_valid():
+        return json_response(filterset.errors, status=400)
+    queryset = filterset.qs
+    if request.GET.get('search', '').strip():
+        queryset = product_search.filter(queryset, request.GET['search'])
+    ordering = [
+        term for term in (term.strip() for term in request.GET.get('ordering', '').split(','))
+        if term.lstrip('-') in PRODUCT_ORDERING_FIELDS
+    ]
+    page = await page_number_page(request, queryset.order_by(*(ordering or ['pk'])))
+    if page is None:
+        return not_found('Invalid page.')
+    count, rows, links = page
+    return json_response({'count': count, **links, 'results': ProductSerializer(rows, many=True).data})
+
+
+@query_budget(2)
+@require_GET
+@versioned(product_cache)
+async def product_detail(request, product_id):
+    try:
+        product = await Product.objects.aget(pk=product_id)
+    except Product.DoesNotExist:
+        return not_found('No Product matches the given query.')
+    return json_response(ProductSerializer(product).data)
+
+
+@query_budget(9)
+@require_GET
+@versioned(order_cache)
+async def order_list(request):
+    """GET /orders/ without the response cache: OrderFilter, ``?view=`` and ``?limit=&offset=``."""
+    list_view = request.GET.get('view', 'full')
+    if list_view not in ORDER_LIST_VIEWS:
+        return json_response({'view': f"Must be one of: {', '.join(ORDER_LIST_VIEWS)}."}, status=400)
+    if response := rejects_keyset(request):
+        return response
+    filterset = OrderFilter(request.GET, queryset=Order.objects.order_by('-created_at', '-order_id'))
+    if not filterset.is_valid():
+        return json_response(filterset.errors, status=400)
+    if list_view == 'count':
+        return json_response({'count': await filterset.qs.acount()})
+    serializer_class = OrderSummarySerializer if list_view == 'summary' else OrderSerializer
+    count, rows, links = await limit_offset_page(request, serializer_class.setup_eager_loading(filterset.qs))
+    return json_response({'count': count, **links, 'results': serializer_class(rows, many=True).data})
+
+
+async def abuild_dashboard():
+    """build_dashboard() with its independent queries issued together through asyncio.gather."""
+    products, months, customers, low_stock, top_selling, recent = await asyncio.gather(
+        Product.objects.aaggregate(**product_counts()),
+        alist(revenue_months()),
+        Customer.objects.acount(),
+        alist(low_stock_products()),
+        sync_to_async(top_selling_products)(limit=LIST_LENGTH),
+        alist(recent_orders()),
+    )
+    return assemble_dashboard(products, months, customers, low_stock, top_selling, recent)
+
+
+@query_budget(7)
+@require_GET
+@authentication_required
+@condition(etag_func=lambda request, *args, **kwargs: dashboard_etag())
+async def dashboard(request):
+    """GET /dashboard/, sharing its cache entries with the synchronous view."""
+    key = f'dashboard:{dashboard_etag()}'
+    data = await cache.aget(key)
+    if data is None:
+        data = await abuild_dashboard()
+        await cache.aset(key, data, settings.API_CACHE_TIMEOUT)
+    return json_response(data)
@@ -0,0 +1,165 @@
+"""
+Per-view query budgets. A view declares the most queries (and optionally milliseconds of
+database time) one request may use, as ``query_budget``: a QueryBudget, or a dict of them
+keyed by viewset action or lowercase HTTP method. QueryBudgetMiddleware measures every
+request and, depending on QUERY_BUDGETS, logs or raises when a view goes over.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudget:
+    """At most ``queries`` queries for one request, taking at most ``db_ms`` (QUERY_BUDGET_DB_MS if None)."""
+
+    def __init__(self, queries, db_ms=None):
+        self.queries = queries
+        self.db_ms = db_ms
+
+    def __repr__(self):
+        return f'QueryBudget(queries={self.queries}, db_ms={self.db_ms})'
+
+    def overruns(self, usage, allowance=0):
+        """What ``usage`` went over this budget (plus ``allowance`` queries) by, as messages; empty when within it."""
+        db_ms = settings.QUERY_BUDGET_DB_MS if self.db_ms is None else self.db_ms
+        problems = []
+        if usage.queries > self.queries + allowance:
+            problems.append(f'{usage.queries} queries (budget {self.queries + allowance})')
+        if db_ms is not None and usage.db_ms > db_ms:
+            problems.append(f'{usage.db_ms:.1f} ms in the database (budget {db_ms} ms)')
+        return problems
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(queries, db_ms=None):
+    """Declare a QueryBudget on a function view."""
+    def decorator(view):
+        view.query_budget = QueryBudget(queries, db_ms)
+        return view
+    return decorator
+
+
+def budget_for(view_func, method):
+    """The budget ``view_func`` (as resolved from a URL) declares for ``method`` requests, or None."""
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view_func, 'cls', None), 'query_budget', None)
+    if isinstance(budget, dict):
+        method = 'get' if method == 'HEAD' else method.lower()
+        actions = getattr(view_func, 'actions', None) or {}
+        budget = budget.get(actions.get(method, method))
+    return budget
+
+
+class QueryUsage:
+    """The queries run, and the seconds they took, while counting() is in effect."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    @property
+    def db_ms(self):
+        return self.seconds * 1000
+
+    @contextmanager
+    def counting(self):
+        """
+        Count the block's queries, including those run in sync_to_async threads: connections
+        are per thread, but the context (and with it this usage) follows the request there.
+        """
+        token = _counting.set((*_counting.get(), self))
+        try:
+            yield self
+        finally:
+            _counting.reset(token)
+
+
+_counting = ContextVar('query_usages', default=())
+
+
+def count_query(execute, sql, params, many, context):
+    """execute_wrapper() on every connection, charging each query to the usages counting it."""
+    usages = _counting.get()
+    if not usages:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for usage in usages:
+            usage.queries += 1
+            usage.seconds += elapsed
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver (see ApiConfig.ready)."""
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+def auth_allowance(request):
+    """Queries authentication may add to a view's own: a session and its user, or a bearer token's user."""
+    allowance = 2 if settings.SESSION_COOKIE_NAME in request.COOKIES else 0
+    if request.META.get('HTTP_AUTHORIZATION', '').startswith('Bearer '):
+        allowance += 1
+    return allowance
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the queries each request runs, and with QUERY_BUDGETS set to ``warn`` or ``raise``
+    reports them as X-Query-Count and X-Query-Time (ms) and checks them against the budget of
+    the view that answered (X-Query-Budget). Looking up the request's user is allowed for on
+    top of the budget (see auth_allowance). A streamed body's queries run after the view
+    returns and aren't counted. Runs natively in both sync and async (ASGI) stacks.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if settings.QUERY_BUDGETS not in ('warn', 'raise'):
+            return self.get_response(request)
+        with QueryUsage().counting() as usage:
+            response = self.get_response(request)
+        return self.check(request, response, usage)
+
+    async def __acall__(self, request):
+        if settings.QUERY_BUDGETS not in ('warn', 'raise'):
+            return await self.get_response(request)
+        with QueryUsage().counting() as usage:
+            response = await self.get_response(request)
+        return self.check(request, response, usage)
+
+    def check(self, request, response, usage):
+        response['X-Query-Count'] = usage.queries
+        response['X-Query-Time'] = f'{usage.db_ms:.1f}'
+        match = getattr(request, 'resolver_match', None)
+        budget = budget_for(match.func, request.method) if match is not None else None
+        if budget is not None:
+            allowance = auth_allowance(request)
+            response['X-Query-Budget'] = budget.queries + allowance
+            problems = budget.overruns(usage, allowance)
+            if problems:
+                message = f"{request.method} {request.path} went over its query budget: {', '.join(problems)}"
+                if settings.QUERY_BUDGETS == 'raise':
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+        return response
@@ -0,0 +1,187 @@
+import codecs
+import csv
+import json
+from collections import Counter, defaultdict
+from decimal import Decimal
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from api.cache import order_cache, product_cache
+from api.filter import local_midnight
+from api.inventory import adjust_stock
+from api.models import Customer, Order, OrderItem, Product
+from api.rollups import apply_revenue_delta, apply_sales_deltas, month_of
+from api.serializers import ProductSerializer
+
+CHUNK_SIZE = 500
+ORDER_BATCH_LIMIT = 1000
+EXPORT_FIELDS = ('id', 'name', 'description', 'price', 'stock', 'active')
+IMPORT_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+
+def read_csv(lines):
+    """Rows of a CSV stream with a header line. Empty cells count as absent, so updates can be partial."""
+    for row in csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig')):
+        yield {name: value for name, value in row.items() if name and value not in (None, '')}
+
+
+def read_ndjson(lines):
+    """One JSON object per line; blank lines are skipped and bad lines become row errors."""
+    for line in codecs.iterdecode(lines, 'utf-8'):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = ValueError(f'Invalid JSON: {exc}')
+        yield row if isinstance(row, (dict, ValueError)) else ValueError('Each line must be a JSON object.')
+
+
+def import_products(rows, chunk_size=CHUNK_SIZE):
+    """
+    Validate ``rows`` with ProductSerializer's rules and write them ``chunk_size`` at a time,
+    one transaction per chunk. Rows carrying an ``id`` update that product, the rest create
+    new ones. Invalid rows are reported by their 1-based position and skipped.
+    """
+    result = {'created': 0, 'updated': 0, 'errors': []}
+    rows = enumerate(rows, start=1)
+    while chunk := list(islice(rows, chunk_size)):
+        _import_chunk(chunk, result)
+    if result['created'] or result['updated']:
+        # bulk_create/bulk_update skip post_save, so retire the caches the signals would have.
+        product_cache.invalidate()
+        order_cache.invalidate()
+    return result
+
+
+def _import_chunk(chunk, result):
+    ids = {row.get('id') for _, row in chunk if isinstance(row, dict) and row.get('id') not in (None, '')}
+    existing = Product.objects.in_bulk([pk for pk in ids if str(pk).isdigit()])
+    to_create, to_update = [], {}
+    for number, row in chunk:
+        if isinstance(row, ValueError):
+            result['errors'].append({'row': number, 'errors': {'non_field_errors': [str(row)]}})
+            continue
+        pk = row.get('id')
+        instance = None
+        if pk not in (None, ''):
+            instance = existing.get(int(pk)) if str(pk).isdigit() else None
+            if instance is None:
+                result['errors'].append({'row': number, 'errors': {'id': [f'Product {pk} does not exist.']}})
+                continue
+        serializer = ProductSerializer(instance, data=row, partial=instance is not None)
+        if not serializer.is_valid():
+            result['errors'].append({'row': number, 'errors': serializer.errors})
+            continue
+        if instance is None:
+            to_create.append(Product(**serializer.validated_data))
+        else:
+            for name, value in serializer.validated_data.items():
+                setattr(instance, name, value)
+            instance.updated_at = timezone.now()  # bulk_update doesn't apply auto_now
+            to_update[instance.pk] = instance
+    with transaction.atomic():
+        Product.objects.bulk_create(to_create)
+        Product.objects.bulk_update(to_update.values(), [*EXPORT_FIELDS[1:], 'updated_at'])
+    result['created'] += len(to_create)
+    result['updated'] += len(to_update)
+
+
+class Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for values in queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=2000):
+        yield writer.writerow(values)
+
+
+def export_ndjson(queryset):
+    for values in queryset.values(*EXPORT_FIELDS).iterator(chunk_size=2000):
+        yield json.dumps(values, default=str) + '\n'
+
+
+def create_orders(user, orders):
+    """
+    Insert a batch of validated OrderBulkSerializer payloads in one transaction: one query
+    resolves the products, one the customers, one reserves the stock, then one bulk_create
+    each for orders and items.
+    Unknown ids fail the whole batch with errors laid out like a ``many=True`` serializer's.
+    """
+    product_ids = {item['product'] for order in orders for item in order['item']}
+    customer_ids = {order['customer'] for order in orders if order.get('customer') is not None}
+    prices = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'price'))
+    customers = set(Customer.objects.filter(pk__in=customer_ids).values_list('pk', flat=True))
+
+    errors = [_missing_ids(order, prices, customers) for order in orders]
+    if any(errors):
+        raise ValidationError(errors)
+
+    created, items = [], []
+    for data in orders:
+        order = Order(created_by=user, customer_id=data.get('customer'), status=data['status'])
+        lines = [
+            OrderItem(order=order, product_id=item['product'], quantity=item['quantity'],
+                      unit_price=prices[item['product']])
+            for item in data['item']
+        ]
+        order.total_price = sum((line.unit_price * line.quantity for line in lines), Decimal('0'))
+        order.total_quantity = sum(line.quantity for line in lines)
+        created.append(order)
+        items.extend(lines)
+
+    reserved = Counter()
+    for item in items:
+        if item.order.status != Order.StatusChoices.CANCELLED:
+            reserved[item.product_id] += item.quantity
+
+    with transaction.atomic():
+        adjust_stock(reserved)
+        Order.objects.bulk_create(created)
+        OrderItem.objects.bulk_create(items)
+        _apply_rollups(created, items)
+    # bulk_create skips the post_save signals that normally keep these in step.
+    order_cache.invalidate()
+    return created
+
+
+def _missing_ids(order, prices, customers):
+    errors = {}
+    if order.get('customer') is not None and order['customer'] not in customers:
+        errors['customer'] = [f'Invalid pk "{order["customer"]}" - object does not exist.']
+    item_errors = [
+        {'product': [f'Invalid pk "{item["product"]}" - object does not exist.']} if item['product'] not in prices else {}
+        for item in order['item']
+    ]
+    if any(item_errors):
+        errors['item'] = item_errors
+    return errors
+
+
+def _apply_rollups(orders, items):
+    """One revenue delta per month, and the sales counters in a fixed number of queries, instead of one per row."""
+    months = defaultdict(lambda: [Decimal('0'), 0, 0])
+    for order in orders:
+        totals = months[month_of(order.created_at)]
+        totals[0] += order.total_price
+        totals[1] += order.total_quantity
+        totals[2] += 1
+    for month, (revenue, quantity, count) in months.items():
+        apply_revenue_delta(local_midnight(month), revenue=revenue, quantity=quantity, orders=count)
+
+    sales = Counter()
+    for item in items:
+        sales[item.product_id, timezone.localtime(item.order.created_at).date()] += item.quantity
+    apply_sales_deltas(sales)
@@ -0,0 +1,237 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Value
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from api.models import Customer, Order, OrderItem, Product, Tombstone
+from api.sync import table_label
+
+
+class VersionedCache:
+    """
+    Response cache for one namespace of data. Entries are stored with the namespace
+    version they were computed at, so invalidate() retires all of them with a single
+    write and works on any cache backend (no key scans or delete_pattern). Retired
+    entries are still served, stale, while one request recomputes them. ``models`` are
+    the tables the namespace's responses are built from (see ConditionalGetMixin).
+    """
+
+    lock_timeout = 30
+
+    def __init__(self, namespace, timeout=None, models=()):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.models = models
+
+    @property
+    def version_key(self):
+        return f'{self.namespace}:version'
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # Seed from the clock so a lost version key never makes old entries current again.
+            cache.add(self.version_key, time.time_ns(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def invalidate(self):
+        self._bump()
+        # Bump again once the write is visible, in case a reader cached the pre-commit rows.
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        cache.set(self.version_key, time.time_ns(), None)
+
+    def make_key(self, prefix, params=(), *parts):
+        """Key for ``params`` (a QueryDict or mapping), ignoring parameter order and blank values."""
+        if hasattr(params, 'lists'):
+            params = params.lists()
+        elif hasattr(params, 'items'):
+            params = params.items()
+        normalized = sorted(
+            (name, value)
+            for name, values in params
+            for value in (values if isinstance(values, (list, tuple)) else [values])
+            if value not in (None, '')
+        )
+        digest = hashlib.sha1('|'.join([urlencode(normalized), *map(str, parts)]).encode()).hexdigest()
+        return f'{self.namespace}:{prefix}:{digest}'
+
+    def set(self, key, value, version=None):
+        timeout = self.timeout if self.timeout is not None else settings.API_CACHE_TIMEOUT
+        cache.set(key, (self.version() if version is None else version, value), timeout)
+
+    def get_or_refresh(self, key, compute):
+        """
+        Return ``(value, state)`` where state is 'HIT', 'STALE' or 'MISS'. A stale entry is
+        recomputed by whichever request takes the refresh lock; the rest keep serving the
+        stale value instead of all hitting the database at once.
+        """
+        version = self.version()
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            self._count('hits')
+            return entry[1], 'HIT'
+        lock_key = f'{key}:refresh'
+        if entry is not None and not cache.add(lock_key, 1, self.lock_timeout):
+            self._count('stale')
+            return entry[1], 'STALE'
+        self._count('misses')
+        try:
+            value = compute()
+            self.set(key, value, version)
+        finally:
+            if entry is not None:
+                cache.delete(lock_key)
+        return value, 'MISS'
+
+    def _count(self, stat):
+        key = f'{self.namespace}:stats:{stat}'
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+    def stats(self):
+        names = ('hits', 'stale', 'misses')
+        counters = cache.get_many([f'{self.namespace}:stats:{name}' for name in names])
+        stats = {name: counters.get(f'{self.namespace}:stats:{name}', 0) for name in names}
+        served = stats['hits'] + stats['stale']
+        total = served + stats['misses']
+        return {
+            'version': self.version(),
+            **stats,
+            'hit_ratio': round(served / total, 4) if total else None,
+        }
+
+
+class CachedListMixin:
+    """
+    Serves ``list()`` from ``list_cache``. Keys are built from the query parameters the view
+    actually understands, plus the requesting user when ``cache_per_user`` is set.
+    """
+
+    list_cache = None
+    cache_per_user = False
+    extra_cache_params = ()
+
+    def list(self, request, *args, **kwargs):
+        # Pages carry absolute next/previous links, and date filters resolve in the active timezone.
+        parts = [request.build_absolute_uri('/'), timezone.get_current_timezone_name()]
+        if self.cache_per_user:
+            parts.append(request.user.pk if request.user.is_authenticated else 'anonymous')
+        key = self.list_cache.make_key('list', self.get_cache_params(), *parts)
+        data, state = self.list_cache.get_or_refresh(
+            key, lambda: self.uncached_list(request, *args, **kwargs).data
+        )
+        return Response(data, headers={'X-Cache': state})
+
+    def uncached_list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def get_cache_params(self):
+        """Only the parameters that shape the response; anything else would just fragment the cache."""
+        names = set(self.extra_cache_params) | {api_settings.SEARCH_PARAM, api_settings.ORDERING_PARAM}
+        if getattr(self, 'filterset_class', None) is not None:
+            names |= set(self.filterset_class.base_filters)
+        # SelectablePagination answers attribute lookups from its default paginator, so its keyset
+        # paginator's parameters (page_size) have to be read off that one directly.
+        paginators = [self.paginator, getattr(self.paginator, 'default', None), getattr(self.paginator, 'keyset', None)]
+        for paginator in filter(None, paginators):
+            for attr in (
+                'page_query_param', 'page_size_query_param', 'limit_query_param', 'offset_query_param',
+                'cursor_query_param', 'paginate_query_param',
+            ):
+                names.add(getattr(paginator, attr, None))
+        return {name: self.request.query_params.getlist(name) for name in names if name}
+
+
+
+def last_writes(models):
+    """
+    The newest updated_at of each of ``models`` and their newest tombstones, as one UNION ALL
+    query on the updated_at and tombstone indexes. Writes stamp updated_at and deletes leave
+    tombstones (what /sync/ relies on), so the latest of these moves with every change,
+    whichever worker made it and whatever cache backend is configured.
+    """
+    # Grouping by a constant leaves GROUP BY out of the SQL: a plain MAX over each table.
+    newest = [
+        model.objects.annotate(every=Value(1)).values('every')
+        .annotate(at=Max('updated_at')).values_list('at', flat=True)
+        for model in models
+    ]
+    deleted = (
+        Tombstone.objects.filter(table__in=[table_label(model) for model in models])
+        .values('table').annotate(at=Max('deleted_at')).values_list('at', flat=True)
+    )
+    return newest[0].union(*newest[1:], deleted, all=True)
+
+
+def validators(changed, parts):
+    """
+    ``(etag, last_modified)`` for a response varying by ``parts`` and built from rows last
+    written at the latest of ``changed`` (see last_writes). Last-Modified is the whole second
+    after that write, and is left out until that second has passed, so a later write can never
+    share it; the ETag keeps the write's full precision.
+    """
+    latest = max(filter(None, changed), default=None)
+    state = [latest.isoformat() if latest else '', *parts]
+    etag = quote_etag(hashlib.sha1('|'.join(map(str, state)).encode()).hexdigest())
+    last_modified = int(latest.timestamp()) + 1 if latest else None
+    if last_modified is not None and last_modified > time.time():
+        last_modified = None
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Let clients keep the body but make them check back every time.
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified for ``list()`` and ``retrieve()``, derived from the newest write to
+    the tables of ``conditional_caches`` before the queryset or serializer is touched, so
+    revalidating an unchanged resource is a 304 that costs one indexed query.
+    """
+
+    conditional_caches = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        models = dict.fromkeys(model for namespace in self.conditional_caches for model in namespace.models)
+        parts = [request.build_absolute_uri(), request.accepted_media_type, timezone.get_current_timezone_name()]
+        if getattr(self, 'cache_per_user', False):
+            parts.append(request.user.pk if request.user.is_authenticated else 'anonymous')
+        etag, last_modified = validators(last_writes(models), parts)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+
+product_cache = VersionedCache('products', models=(Product,))
+# Order listings embed customers, items and product names; see api.signals.
+order_cache = VersionedCache('orders', models=(Order, OrderItem, Customer, Product))
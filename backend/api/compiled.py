@@ -0,0 +1,256 @@
+import decimal
+from collections import defaultdict
+from itertools import islice
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from api.models import OrderItem
+from api.serializers import CustomerSerializer
+
+# Columns a model property reads, so it can be evaluated from a .values() row.
+PROPERTY_COLUMNS = {
+    (OrderItem, 'Item_SubTotal'): ('unit_price', 'quantity'),
+}
+
+# SerializerMethodFields, rewritten against the rendered row (``out``) instead of the instance.
+METHOD_FIELDS = {
+    (CustomerSerializer, 'OrderCount'): lambda out: len(out['OrderDetail']),
+}
+
+
+class CompiledSerializer:
+    """
+    A read-only ModelSerializer compiled into a rendering plan over ``.values()`` rows. Each
+    field gets a converter chosen once from its DRF type (decimals, datetimes, UUIDs) instead
+    of going through ``to_representation`` per value, and nested ``many=True`` serializers,
+    m2m primary keys and FK-nested serializers are fetched with one ``.values()`` query per
+    relation for the whole page. The output is the same data the serializer produces.
+    """
+
+    def __init__(self, serializer, model=None, prefix=''):
+        if isinstance(serializer, type):
+            serializer = serializer()
+        self.serializer_class = type(serializer)
+        self.model = model or serializer.Meta.model
+        self.prefix = prefix
+        self.pk_lookup = f'{prefix}{self.model._meta.pk.attname}'
+        self.plan = [
+            self.compile_field(key, field)
+            for key, field in serializer.fields.items()
+            if not field.write_only
+        ]
+
+    def compile_field(self, key, field):
+        if isinstance(field, serializers.SerializerMethodField):
+            try:
+                return ('method', key, METHOD_FIELDS[self.serializer_class, key])
+            except KeyError:
+                raise ImproperlyConfigured(f'No METHOD_FIELDS entry for {self.serializer_class.__name__}.{key}.')
+        if field.source == '*':
+            raise ImproperlyConfigured(f"{self.serializer_class.__name__}.{key}: source='*' can't be compiled.")
+
+        if isinstance(field, serializers.ListSerializer):
+            relation = self.model_field(field.source)
+            if not relation.one_to_many:
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{key} must be a reverse foreign key.')
+            child = CompiledSerializer(field.child, model=relation.related_model)
+            return ('many', key, child, relation.field.name)
+        if isinstance(field, serializers.BaseSerializer):
+            relation = self.model_field(field.source)
+            child = CompiledSerializer(field, model=relation.related_model, prefix=f'{self.prefix}{field.source}__')
+            return ('nested', key, child)
+        if isinstance(field, serializers.ManyRelatedField):
+            relation = self.model_field(field.source)
+            return ('pks', key, relation.related_model, relation.related_query_name())
+
+        lookup = '__'.join(field.source_attrs)
+        try:
+            self.model_field(lookup)
+        except FieldDoesNotExist:
+            columns = PROPERTY_COLUMNS.get((self.model, lookup))
+            if columns is None:
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{key}: {lookup!r} is not a column.')
+            getter = getattr(self.model, lookup).fget
+            return ('property', key, getter, tuple(f'{self.prefix}{column}' for column in columns))
+        return ('column', key, f'{self.prefix}{lookup}', field)
+
+    def model_field(self, lookup):
+        model = self.model
+        *path, name = lookup.split('__')
+        for step in path:
+            model = model._meta.get_field(step).related_model
+        return model._meta.get_field(name)
+
+    def lookups(self):
+        """Every column this plan reads, for ``.values()``."""
+        names = [self.pk_lookup]
+        for kind, key, *spec in self.plan:
+            if kind == 'column':
+                names.append(spec[0])
+            elif kind == 'property':
+                names.extend(spec[1])
+            elif kind == 'nested':
+                names.extend(spec[0].lookups())
+        return list(dict.fromkeys(names))
+
+    def values(self, queryset, *extra):
+        """``queryset`` as rows for render(); ``extra`` adds columns the caller needs, such as ordering keys."""
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*self.lookups(), *extra]))
+
+    def render(self, rows):
+        rows = list(rows)
+        outs = [{} for _ in rows]
+        methods = []
+        for kind, key, *spec in self.plan:
+            if kind == 'column':
+                lookup, field = spec
+                convert = converter(field)
+                for row, out in zip(rows, outs):
+                    value = row[lookup]
+                    out[key] = None if value is None else convert(value)
+            elif kind == 'property':
+                getter, columns = spec
+                names = [column[len(self.prefix):] for column in columns]
+                for row, out in zip(rows, outs):
+                    out[key] = getter(SimpleNamespace(**{name: row[column] for name, column in zip(names, columns)}))
+            elif kind == 'nested':
+                child, = spec
+                present = [(row, out) for row, out in zip(rows, outs) if row[child.pk_lookup] is not None]
+                for out in outs:
+                    out[key] = None
+                for (_, out), rendered in zip(present, child.render(row for row, _ in present)):
+                    out[key] = rendered
+            elif kind == 'many':
+                child, link = spec
+                groups = defaultdict(list)
+                children = list(child.values(
+                    child.model.objects.filter(**{f'{link}__in': {row[self.pk_lookup] for row in rows}}), link
+                ))
+                for row, rendered in zip(children, child.render(children)):
+                    groups[row[link]].append(rendered)
+                for row, out in zip(rows, outs):
+                    out[key] = groups.get(row[self.pk_lookup], [])
+            elif kind == 'pks':
+                related_model, query_name = spec
+                groups = defaultdict(list)
+                pairs = related_model.objects.filter(**{f'{query_name}__in': {row[self.pk_lookup] for row in rows}})
+                for owner, pk in pairs.values_list(query_name, 'pk'):
+                    groups[owner].append(pk)
+                for row, out in zip(rows, outs):
+                    out[key] = groups.get(row[self.pk_lookup], [])
+            else:
+                methods.append((key, spec[0]))
+                for out in outs:
+                    out[key] = None  # keeps the serializer's key order; filled in below
+        for key, method in methods:
+            for out in outs:
+                out[key] = method(out)
+        return outs
+
+
+def converter(field):
+    """A function rendering non-None values the way ``field.to_representation`` does."""
+    if isinstance(field, serializers.DecimalField) and not (field.localize or field.normalize_output):
+        quantum = decimal.Decimal('.1') ** field.decimal_places if field.decimal_places is not None else None
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        as_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+
+        def convert_decimal(value):
+            if not isinstance(value, decimal.Decimal):
+                value = decimal.Decimal(str(value).strip())
+            if quantum is not None:
+                value = value.quantize(quantum, rounding=field.rounding, context=context)
+            return f'{value:f}' if as_string else value
+        return convert_decimal
+
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        zone = getattr(field, 'timezone', timezone.get_current_timezone() if settings.USE_TZ else None)
+        if output_format is not None and output_format.lower() == ISO_8601 and zone is not None:
+            def convert_datetime(value):
+                if not timezone.is_aware(value):
+                    return field.to_representation(value)
+                text = value.astimezone(zone).isoformat()
+                return text[:-6] + 'Z' if text.endswith('+00:00') else text
+            return convert_datetime
+
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        return str
+
+    if type(field) in (
+        serializers.CharField, serializers.EmailField, serializers.IntegerField, serializers.BooleanField,
+        serializers.ChoiceField, serializers.ReadOnlyField,
+    ) or (isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None):
+        # Values from the database already have the type these fields render.
+        return identity
+
+    return field.to_representation
+
+
+def identity(value):
+    return value
+
+
+class FastListMixin:
+    """
+    Opt-in (FAST_SERIALIZERS) fast path for ``list()``: filtered, paginated ``.values()`` rows
+    rendered by the compiled form of the view's serializer, for the same response.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer() if settings.FAST_SERIALIZERS else None
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = compiled.values(queryset, *self.get_ordering_columns(queryset))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.render(page))
+        return Response(compiled.render(rows))
+
+    def get_ordering_columns(self, queryset):
+        """Columns keyset pagination reads back from the last row of a page."""
+        keyset = getattr(self.paginator, 'keyset', self.paginator)
+        ordering = getattr(keyset, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return [term.lstrip('-') for term in [*queryset.query.order_by, *ordering] if isinstance(term, str)]
+
+    def get_compiled_serializer(self):
+        return compiled_serializer(self.get_serializer_class())
+
+
+_compiled = {}
+
+
+def compiled_serializer(serializer_class):
+    """The CompiledSerializer for ``serializer_class``, built on first use."""
+    compiled = _compiled.get(serializer_class)
+    if compiled is None:
+        compiled = _compiled[serializer_class] = CompiledSerializer(serializer_class)
+    return compiled
+
+
+def iter_serialized(serializer_class, queryset, chunk_size):
+    """
+    ``serializer_class`` output for every row of ``queryset``, fetched with ``.iterator()`` and
+    rendered ``chunk_size`` rows at a time (compiled when FAST_SERIALIZERS is on).
+    """
+    if settings.FAST_SERIALIZERS:
+        compiled = compiled_serializer(serializer_class)
+        rows, render = compiled.values(queryset).iterator(chunk_size=chunk_size), compiled.render
+    else:
+        rows = queryset.iterator(chunk_size=chunk_size)
+
+        def render(chunk):
+            return serializer_class(chunk, many=True).data
+    while chunk := list(islice(rows, chunk_size)):
+        yield from render(chunk)
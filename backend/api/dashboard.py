@@ -0,0 +1,67 @@
+import hashlib
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from api.cache import order_cache, product_cache
+from api.filter import OrderFilter
+from api.models import Customer, Order, Product
+from api.rollups import month_of, monthly_revenue_series, revenue_months, top_selling_products
+from api.serializers import OrderSummarySerializer, ProductSalesSerializer, ProductSerializer
+
+LOW_STOCK_THRESHOLD = 5
+LIST_LENGTH = 5
+
+
+def dashboard_etag():
+    """
+    Changes whenever a product or order write retires those caches, and at local midnight
+    (for "this month" and "recent"). Computing it costs two cache reads and no queries.
+    """
+    state = f'{product_cache.version()}:{order_cache.version()}:{timezone.localdate()}:{timezone.get_current_timezone_name()}'
+    return hashlib.sha1(state.encode()).hexdigest()
+
+
+def product_counts():
+    return {
+        'active': Count('pk', filter=Q(active=True)),
+        'low_stock': Count('pk', filter=Q(stock__lt=LOW_STOCK_THRESHOLD)),
+    }
+
+
+def low_stock_products():
+    return Product.objects.filter(stock__lt=LOW_STOCK_THRESHOLD).order_by('stock', 'pk')[:LIST_LENGTH]
+
+
+def recent_orders():
+    return OrderSummarySerializer.setup_eager_loading(
+        OrderFilter({'recent': 'true'}, Order.objects.all()).qs
+    ).order_by('-created_at', '-order_id')[:LIST_LENGTH]
+
+
+def build_dashboard():
+    """Everything the dashboard page shows, in seven queries."""
+    return assemble_dashboard(
+        products=Product.objects.aggregate(**product_counts()),
+        months=list(revenue_months()),
+        customers=Customer.objects.count(),
+        low_stock=list(low_stock_products()),
+        top_selling=top_selling_products(limit=LIST_LENGTH),
+        recent=list(recent_orders()),
+    )
+
+
+def assemble_dashboard(products, months, customers, low_stock, top_selling, recent):
+    """The dashboard payload from the evaluated query results; shared with the async view."""
+    this_month = next((entry for entry in months if entry.month == month_of(timezone.now())), None)
+    return {
+        'orders_this_month': this_month.order_count if this_month else 0,
+        'revenue_this_month': this_month.revenue if this_month else 0,
+        'active_products': products['active'],
+        'total_customers': customers,
+        'low_stock_count': products['low_stock'],
+        'low_stock': ProductSerializer(low_stock, many=True).data,
+        'top_selling': ProductSalesSerializer(top_selling, many=True).data,
+        'recent_orders': OrderSummarySerializer(recent, many=True).data,
+        'monthly_revenue': monthly_revenue_series(months),
+    }
@@ -0,0 +1,57 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from api.cache import product_cache
+from api.models import Order, Product
+from api.rollups import per_row_value
+
+
+class InsufficientStock(ValidationError):
+    default_code = 'insufficient_stock'
+
+
+def held_stock(order):
+    """Units of each product ``order`` is holding; cancelled orders hold nothing."""
+    if order.status == Order.StatusChoices.CANCELLED:
+        return Counter()
+    return Counter(dict(
+        order.item.order_by().values('product').annotate(quantity=Sum('quantity')).values_list('product', 'quantity')
+    ))
+
+
+def adjust_stock(changes):
+    """
+    Take ``changes[product_id]`` units from each product (negative amounts put stock back) in
+    a single conditional UPDATE. Rows are only touched where ``stock >= quantity``, so two
+    checkouts racing for the last unit can't both succeed; if any product is short nothing
+    is changed and InsufficientStock is raised.
+    """
+    changes = {product_id: quantity for product_id, quantity in changes.items() if quantity}
+    if not changes:
+        return
+    with transaction.atomic():
+        requested = per_row_value(changes)
+        updated = Product.objects.filter(pk__in=changes, stock__gte=requested).update(
+            stock=F('stock') - requested, updated_at=timezone.now()
+        )
+        short = updated != len(changes)
+        if short:
+            transaction.set_rollback(True)
+    if short:
+        raise InsufficientStock({'item': [
+            f'Not enough stock for {product.name} ({product.stock} left, {changes[product.pk]} requested).'
+            for product in Product.objects.filter(pk__in=changes).order_by('pk')
+            if product.stock < changes[product.pk]
+        ] or ['Product does not exist.']})
+    product_cache.invalidate()
+
+
+def restock(order, previously_held):
+    """Apply the difference between what ``order`` held before a write and what it holds now."""
+    changes = held_stock(order)
+    changes.subtract(previously_held)
+    adjust_stock(changes)
@@ -0,0 +1,222 @@
+import json
+import math
+import statistics
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from api import urls as api_urls
+from api.models import Customer, Order, OrderItem, Product, User
+
+PERCENTILES = (50, 90, 99)
+
+
+def endpoint_cases(product, order, customer, user):
+    """
+    One or more requests for every route in api/urls.py, against existing rows. Writes are
+    marked so they can be rolled back, which keeps the data the same from run to run.
+    """
+    word = product.name.split()[0]
+    item = {'product': product.pk, 'quantity': 1}
+    new_order = {'customer': customer.pk, 'item': [item]}
+    created_at = order.created_at
+    return [
+        ('products', 'GET', '/products/', {}),
+        ('products ?search=', 'GET', '/products/', {'search': word}),
+        ('products ?ordering=-price', 'GET', '/products/', {'ordering': '-price'}),
+        ('products/info', 'GET', '/products/info/', {}),
+        ('products/info ?embed=products', 'GET', '/products/info/', {'embed': 'products'}),
+        ('products/info ?embed=all', 'GET', '/products/info/', {'embed': 'all'}),
+        ('products/autocomplete', 'GET', '/products/autocomplete/', {'q': word[:3]}),
+        ('products/export', 'GET', '/products/export/', {}),
+        ('products/<id>', 'GET', f'/products/{product.pk}/', {}),
+        ('cache/stats', 'GET', '/cache/stats/', {}),
+        ('metrics', 'GET', '/metrics/', {}),
+        ('dashboard', 'GET', '/dashboard/', {}),
+        ('sync', 'GET', '/sync/', {'tables': 'products'}),
+        ('async/products', 'GET', '/async/products/', {}),
+        ('async/products/<id>', 'GET', f'/async/products/{product.pk}/', {}),
+        ('async/orders', 'GET', '/async/orders/', {}),
+        ('async/dashboard', 'GET', '/async/dashboard/', {}),
+        ('orders', 'GET', '/orders/', {}),
+        ('orders ?view=summary', 'GET', '/orders/', {'view': 'summary'}),
+        ('orders ?view=count&status=', 'GET', '/orders/', {'view': 'count', 'status': order.status}),
+        ('orders/month-revenue', 'GET', '/orders/month-revenue/',
+         {'year': created_at.year, 'month': created_at.month}),
+        ('orders/monthly-revenue', 'GET', '/orders/monthly-revenue/', {}),
+        ('orders/top-selling', 'GET', '/orders/top-selling/', {}),
+        ('orders/<id>', 'GET', f'/orders/{order.pk}/', {}),
+        ('users', 'GET', '/users/', {}),
+        ('users/<id>', 'GET', f'/users/{user.pk}/', {}),
+        ('customers', 'GET', '/customers/', {}),
+        ('customers/autocomplete', 'GET', '/customers/autocomplete/', {'q': customer.name[:3]}),
+        ('customers/<id>', 'GET', f'/customers/{customer.pk}/', {}),
+        ('api root', 'GET', '/', {}),
+        ('POST products', 'POST', '/products/',
+         {'name': 'Benchmark Widget', 'description': 'Benchmark product.', 'price': '9.99', 'stock': 10}),
+        ('POST products/bulk', 'POST', '/products/bulk/', '\n'.join(
+            json.dumps({'name': f'Benchmark Import {n}', 'description': 'Imported.', 'price': '1.00', 'stock': 1})
+            for n in range(100)
+        )),
+        ('POST orders', 'POST', '/orders/', new_order),
+        ('POST orders/bulk', 'POST', '/orders/bulk/', [new_order] * 10),
+        ('POST customers', 'POST', '/customers/', {'name': 'Benchmark Retail', 'email': 'benchmark@example.com'}),
+    ]
+
+
+def api_routes():
+    """The routes in api/urls.py, leaving out the router's ``.json``-style format suffix variants."""
+    return {
+        str(pattern.pattern) for pattern in api_urls.urlpatterns
+        if 'format>' not in str(pattern.pattern) and 'format_suffix' not in str(pattern.pattern)
+    }
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of already sorted values."""
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every API endpoint through Django's test client against the current data "
+        "(see seed_data) and report latency percentiles, queries and bytes per request. "
+        "Writes run in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=1, help="Untimed requests per endpoint first.")
+        parser.add_argument('--cold', action='store_true', help="Clear the cache before every request.")
+        parser.add_argument('--only', default='', help="Only endpoints whose label contains this text.")
+        parser.add_argument('--json', action='store_true', help="Emit one JSON document instead of text.")
+        parser.add_argument('--output', help="Also write the JSON document to this file.")
+        parser.add_argument('--compare', help="A previous --output file; regressions make the command fail.")
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help="Allowed p50 slowdown against --compare, as a fraction (default 0.25).")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        product = Product.objects.filter(active=True, stock__gte=100).order_by('pk').first()
+        order = Order.objects.filter(customer__isnull=False).order_by('-created_at').first()
+        customer = Customer.objects.order_by('pk').first()
+        # Staff if there is one, for /cache/stats/.
+        user = User.objects.order_by('-is_staff', 'pk').first()
+        if None in (product, order, customer, user):
+            raise CommandError(
+                'Needs at least a user, a customer, an order and an active product with 100 in stock; '
+                'run seed_data first.'
+            )
+
+        client = Client()
+        client.force_login(user)
+        cases = [case for case in endpoint_cases(product, order, customer, user) if options['only'] in case[0]]
+        # Silk records every request and query it sees, which would be measured along with the API.
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('silk.')]
+        with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            results = [self.measure(client, case, options) for case in cases]
+
+        covered = {resolve(path).route for _, _, path, _ in cases}
+        document = {
+            'database': connection.vendor,
+            'data': {
+                model.__name__.lower(): model.objects.count()
+                for model in (User, Product, Customer, Order, OrderItem)
+            },
+            'settings': {
+                'fast_serializers': settings.FAST_SERIALIZERS,
+                'renderer': settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'][0],
+            },
+            'repeat': options['repeat'],
+            'cold': options['cold'],
+            'results': results,
+            'uncovered': [] if options['only'] else sorted(api_routes() - covered),
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(document, output, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(document, indent=2))
+        else:
+            self.write_table(document)
+
+        if options['compare']:
+            with open(options['compare']) as previous:
+                regressions = self.compare(json.load(previous), results, options['threshold'])
+            if regressions:
+                raise CommandError('Regressions against {}:\n{}'.format(options['compare'], '\n'.join(regressions)))
+
+    def measure(self, client, case, options):
+        label, method, path, data = case
+        timings, queries, statuses, size = [], [], set(), 0
+        for run in range(options['warmup'] + options['repeat']):
+            if options['cold']:
+                cache.clear()
+            with nullcontext() if method == 'GET' else transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = self.request(client, method, path, data)
+                    content = b''.join(response.streaming_content) if response.streaming else response.content
+                    elapsed = time.perf_counter() - started
+                if method != 'GET':
+                    transaction.set_rollback(True)
+            if run < options['warmup']:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+            statuses.add(response.status_code)
+            size = len(content)
+
+        timings.sort()
+        return {
+            'endpoint': label,
+            'method': method,
+            'path': path,
+            'status': sorted(statuses),
+            'ok': all(code < 400 for code in statuses),
+            **{f'p{q}_ms': round(percentile(timings, q), 3) for q in PERCENTILES},
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': statistics.median_low(queries),
+            'max_queries': max(queries),
+            'bytes': size,
+        }
+
+    def request(self, client, method, path, data):
+        if method == 'GET':
+            return client.get(path, data)
+        if isinstance(data, str):
+            return client.post(path, data, content_type='application/x-ndjson')
+        return client.post(path, data, content_type='application/json')
+
+    def write_table(self, document):
+        for result in document['results']:
+            style = self.style.SUCCESS if result['ok'] else self.style.ERROR
+            self.stdout.write(style(
+                f"{result['endpoint']:<32} p50 {result['p50_ms']:>9} ms  p90 {result['p90_ms']:>9} ms  "
+                f"p99 {result['p99_ms']:>9} ms  {result['queries']:>3} queries  {result['bytes']:>9} bytes"
+                f"{'' if result['ok'] else '  status ' + ','.join(map(str, result['status']))}"
+            ))
+        for route in document['uncovered']:
+            self.stdout.write(self.style.WARNING(f"Not benchmarked: {route}"))
+
+    def compare(self, previous, results, threshold):
+        """Lines describing endpoints that got slower by more than ``threshold`` or issue more queries."""
+        before = {result['endpoint']: result for result in previous.get('results', [])}
+        regressions = []
+        for result in results:
+            old = before.get(result['endpoint'])
+            if old is None:
+                continue
+            if result['p50_ms'] > old['p50_ms'] * (1 + threshold):
+                regressions.append(f"{result['endpoint']}: p50 {old['p50_ms']} ms -> {result['p50_ms']} ms")
+            if result['queries'] > old['queries']:
+                regressions.append(f"{result['endpoint']}: {old['queries']} -> {result['queries']} queries")
+        return regressions
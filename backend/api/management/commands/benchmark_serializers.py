@@ -0,0 +1,75 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.compiled import CompiledSerializer
+from api.models import Customer, Order, Product
+from api.serializers import CustomerSerializer, OrderSerializer, OrderSummarySerializer, ProductSerializer
+
+
+def serializer_cases(limit):
+    """The list responses FAST_SERIALIZERS covers, each on one page of ``limit`` rows as the views fetch it."""
+    return [
+        ('products', ProductSerializer, Product.objects.order_by('pk')[:limit]),
+        ('orders ?view=summary', OrderSummarySerializer,
+         OrderSummarySerializer.setup_eager_loading(Order.objects.order_by('-created_at'))[:limit]),
+        ('orders', OrderSerializer, OrderSerializer.setup_eager_loading(Order.objects.order_by('-created_at'))[:limit]),
+        ('customers', CustomerSerializer, CustomerSerializer.setup_eager_loading(Customer.objects.order_by('pk'))[:limit]),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time DRF serializers against their compiled (api.compiled) forms on the current data: "
+        "queries, serialization and JSON rendering of one list page, and check the bytes match."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help="Rows per page.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per serializer.")
+        parser.add_argument('--json', action='store_true', help="Emit one JSON document instead of text.")
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        results = []
+        for label, serializer_class, queryset in serializer_cases(options['limit']):
+            compiled = CompiledSerializer(serializer_class)
+
+            def drf():
+                return renderer.render(serializer_class(queryset.all(), many=True).data)
+
+            def fast():
+                return renderer.render(compiled.render(compiled.values(queryset.all())))
+
+            timings = {'drf': [], 'compiled': []}
+            for _ in range(options['repeat']):
+                for name, run in (('drf', drf), ('compiled', fast)):
+                    started = time.perf_counter()
+                    run()
+                    timings[name].append(time.perf_counter() - started)
+            drf_ms, fast_ms = (statistics.median(timings[name]) * 1000 for name in ('drf', 'compiled'))
+            rows = queryset.count()
+            results.append({
+                'serializer': label,
+                'rows': rows,
+                'identical': drf() == fast(),
+                'drf_ms': round(drf_ms, 3),
+                'compiled_ms': round(fast_ms, 3),
+                'drf_rows_per_s': round(rows / drf_ms * 1000) if drf_ms else None,
+                'compiled_rows_per_s': round(rows / fast_ms * 1000) if fast_ms else None,
+                'speedup': round(drf_ms / fast_ms, 2) if fast_ms else None,
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps({'limit': options['limit'], 'results': results}, indent=2))
+            return
+        for result in results:
+            style = self.style.SUCCESS if result['identical'] else self.style.ERROR
+            self.stdout.write(style(
+                f"{result['serializer']:<22} {result['rows']:>6} rows  drf {result['drf_ms']:>9} ms  "
+                f"compiled {result['compiled_ms']:>9} ms  x{result['speedup']}"
+                f"{'' if result['identical'] else '  OUTPUT DIFFERS'}"
+            ))
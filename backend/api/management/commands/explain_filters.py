@@ -0,0 +1,76 @@
+import json
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from api.filter import OrderFilter, ProductFilter
+from api.models import Customer, Order, Product
+from api.search import customer_search, product_search
+
+# "Seq Scan on t" (PostgreSQL) or a bare "SCAN t" (SQLite) means every row is read.
+FULL_SCAN = re.compile(r'Seq Scan on|\bSCAN \w+\s*$', re.MULTILINE)
+
+
+def filter_cases():
+    """Every filter the API exposes, built through the same FilterSets the views use."""
+    today = timezone.localdate()
+    return [
+        ('products ?name__icontains=', ProductFilter({'name__icontains': 'wid'}, Product.objects.all()).qs),
+        ('products ?name__iexact=', ProductFilter({'name__iexact': 'Widget'}, Product.objects.all()).qs),
+        ('products ?price__range=', ProductFilter({'price__range': '10,20'}, Product.objects.all()).qs),
+        ('products ?stock__lt=5', ProductFilter({'stock__lt': '5'}, Product.objects.all()).qs),
+        ('products ?active=true&stock__lt=5',
+         ProductFilter({'active': 'true', 'stock__lt': '5'}, Product.objects.all()).qs),
+        ('orders ?status=', OrderFilter({'status': 'PE'}, Order.objects.all()).qs),
+        ('orders ?status=&created_at__gt=',
+         OrderFilter({'status': 'PE', 'created_at__gt': today.isoformat()}, Order.objects.all()).qs),
+        ('orders ?created_at=', OrderFilter({'created_at': today.isoformat()}, Order.objects.all()).qs),
+        ('orders ?month=', OrderFilter({'month': today.month}, Order.objects.all()).qs),
+        ('orders ?year=&month=', OrderFilter({'year': today.year, 'month': today.month}, Order.objects.all()).qs),
+        ('orders ?from=&to=',
+         OrderFilter({'from': today.replace(day=1).isoformat(), 'to': today.isoformat()}, Order.objects.all()).qs),
+        ('orders ?recent=true', OrderFilter({'recent': 'true'}, Order.objects.all()).qs),
+        ('products ?search=', product_search.filter(Product.objects.all(), 'wid')),
+        ('customers ?search=', customer_search.filter(Customer.objects.all(), 'acme')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN and time the query behind every API filter, flagging the ones that still read "
+        "the whole table. Run it against representative data before and after migrating."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Timed executions per filter.")
+        parser.add_argument('--json', action='store_true', help="Emit one JSON document instead of text.")
+
+    def handle(self, *args, **options):
+        results = []
+        for label, queryset in filter_cases():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.values_list('pk'))
+                timings.append((time.perf_counter() - started) * 1000)
+            results.append({
+                'filter': label,
+                'full_scan': bool(FULL_SCAN.search(plan)),
+                'median_ms': round(statistics.median(timings), 3) if timings else None,
+                'plan': plan.splitlines(),
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps({'vendor': connection.vendor, 'results': results}, indent=2))
+            return
+        for result in results:
+            style = self.style.WARNING if result['full_scan'] else self.style.SUCCESS
+            verdict = 'FULL SCAN' if result['full_scan'] else 'index'
+            self.stdout.write(style(f"{result['filter']:<40} {verdict:<10} {result['median_ms']} ms"))
+            for line in result['plan']:
+                self.stdout.write(f"    {line}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete /sync/ tombstones older than SYNC_TOMBSTONE_DAYS (or --days)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Retention in days; defaults to SYNC_TOMBSTONE_DAYS.")
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} tombstone(s)."))
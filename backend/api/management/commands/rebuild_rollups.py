@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.rollups import rebuild_monthly_revenue, rebuild_product_sales
+
+
+class Command(BaseCommand):
+    help = "Recompute the revenue and product sales rollup tables from the orders table."
+
+    def handle(self, *args, **options):
+        months = rebuild_monthly_revenue()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt monthly revenue for {months} month(s)."))
+        products = rebuild_product_sales()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales counters for {products} product(s)."))
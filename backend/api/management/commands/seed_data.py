@@ -0,0 +1,153 @@
+import json
+import random
+import secrets
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import order_cache, product_cache
+from api.models import Customer, Order, OrderItem, Product, User
+from api.rollups import rebuild_monthly_revenue, rebuild_product_sales
+
+ADJECTIVES = ('Blue', 'Compact', 'Deluxe', 'Heavy', 'Mini', 'Pro', 'Rapid', 'Silent', 'Smart', 'Steel')
+NOUNS = ('Bracket', 'Cable', 'Drill', 'Gadget', 'Hinge', 'Lamp', 'Pump', 'Sprocket', 'Valve', 'Widget')
+SURNAMES = ('Traders', 'Retail', 'Supplies', 'Hardware', 'Stores', 'Wholesale')
+STATUS_WEIGHTS = {
+    Order.StatusChoices.COMPLETED: 6,
+    Order.StatusChoices.PENDING: 3,
+    Order.StatusChoices.CANCELLED: 1,
+}
+
+
+def seed(users, products, customers, orders, items, days, rng, batch_size):
+    """
+    Insert the requested volumes with bulk_create, ``batch_size`` rows per INSERT, and return
+    what was created. Orders are spread over the last ``days`` days with one to ``items``
+    lines each, priced and totalled as the API would; the rollups are rebuilt afterwards.
+    """
+    # Names only need to be unique; the random seed keeps every volume, price and date reproducible.
+    tag = secrets.token_hex(3)
+    counts = {}
+
+    password = make_password('benchmark')  # hashed once: hashing per user would dominate the run
+    created_users = User.objects.bulk_create([
+        User(email=f'seed-{tag}-{n}@example.com', first_name='Seed', last_name=f'User {n}',
+             phone_number=f'555{n:07d}'[-10:], password=password,
+             is_staff=n == 0)  # benchmark_api signs in as staff to reach /cache/stats/
+        for n in range(users)
+    ], batch_size=batch_size)
+    counts['users'] = len(created_users)
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    if not user_ids:
+        raise CommandError('There are no users to attribute orders to; seed at least one with --users.')
+
+    Product.objects.bulk_create([
+        Product(
+            name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}',
+            description=f'Seeded product {n}.',
+            price=Decimal(rng.randint(100, 50_000)) / 100,
+            stock=rng.randint(0, 500),
+            active=rng.random() < 0.9,
+        )
+        for n in range(products)
+    ], batch_size=batch_size)
+    counts['products'] = products
+    prices = dict(Product.objects.values_list('pk', 'price'))
+
+    Customer.objects.bulk_create([
+        Customer(
+            name=f'{rng.choice(NOUNS)} {rng.choice(SURNAMES)} {n}',
+            email=f'customer-{tag}-{n}@example.com',
+            phone_number=f'556{n:07d}'[-10:],
+            created_by_id=rng.choice(user_ids),
+        )
+        for n in range(customers)
+    ], batch_size=batch_size)
+    counts['customers'] = customers
+    customer_ids = list(Customer.objects.values_list('pk', flat=True))
+
+    if orders and not (prices and customer_ids):
+        raise CommandError('Orders need at least one product and one customer.')
+    product_ids = list(prices)
+    statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+    now = timezone.now()
+    counts['orders'] = counts['items'] = 0
+    for start in range(0, orders, batch_size):
+        created, lines = [], []
+        for _ in range(min(batch_size, orders - start)):
+            order = Order(
+                customer_id=rng.choice(customer_ids),
+                created_by_id=rng.choice(user_ids),
+                status=rng.choices(statuses, weights)[0],
+            )
+            order_lines = [
+                OrderItem(order=order, product_id=product_id, quantity=rng.randint(1, 5),
+                          unit_price=prices[product_id])
+                for product_id in rng.sample(product_ids, min(rng.randint(1, items), len(product_ids)))
+            ]
+            order.total_price = sum((line.unit_price * line.quantity for line in order_lines), Decimal('0'))
+            order.total_quantity = sum(line.quantity for line in order_lines)
+            order.seeded_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+            created.append(order)
+            lines.extend(order_lines)
+        with transaction.atomic():
+            Order.objects.bulk_create(created, batch_size=batch_size)
+            # created_at is auto_now_add, which bulk_create fills in with the current time.
+            for order in created:
+                order.created_at = order.seeded_at
+            Order.objects.bulk_update(created, ['created_at'], batch_size=batch_size)
+            OrderItem.objects.bulk_create(lines, batch_size=batch_size)
+        counts['orders'] += len(created)
+        counts['items'] += len(lines)
+
+    rebuild_monthly_revenue()
+    rebuild_product_sales()
+    # bulk_create skips the post_save signals that normally keep these in step.
+    product_cache.invalidate()
+    order_cache.invalidate()
+    return counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Add users, products, customers and orders with their items in bulk, for benchmarks "
+        "(see benchmark_api) and local testing. The same --seed gives the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--customers', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--items', type=int, default=4, help="Most lines per order (at least one).")
+        parser.add_argument('--days', type=int, default=365, help="Spread order dates over this many past days.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per INSERT.")
+        parser.add_argument('--json', action='store_true', help="Emit one JSON document instead of text.")
+
+    def handle(self, *args, **options):
+        if options['items'] < 1 or options['batch_size'] < 1 or options['days'] < 0:
+            raise CommandError('--items and --batch-size must be positive and --days not negative.')
+        started = time.perf_counter()
+        counts = seed(
+            users=options['users'],
+            products=options['products'],
+            customers=options['customers'],
+            orders=options['orders'],
+            items=options['items'],
+            days=options['days'],
+            rng=random.Random(options['seed']),
+            batch_size=options['batch_size'],
+        )
+        seconds = round(time.perf_counter() - started, 3)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'seed': options['seed'], 'created': counts, 'seconds': seconds}, indent=2))
+            return
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {seconds}s."))
@@ -0,0 +1,178 @@
+"""
+In-process request metrics. MetricsMiddleware times a sample of requests (METRICS_SAMPLE_RATE)
+and counts their queries and database time, adding a Server-Timing header to each sampled
+response. Measurements are folded into a fixed-size latency histogram per endpoint, so memory
+stays bounded however long the worker runs; /metrics/ reports this worker's figures.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from api.budgets import QueryUsage
+
+# Upper bounds (ms) of the latency histogram buckets; anything slower lands in a final overflow bucket.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+OTHER_ENDPOINTS = 'other'
+
+
+class EndpointStats:
+    __slots__ = ('requests', 'errors', 'buckets', 'total_ms', 'max_ms', 'queries', 'max_queries', 'db_ms')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_ms = 0.0
+
+    def add(self, elapsed_ms, queries, db_ms, error):
+        self.requests += 1
+        self.errors += error
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        self.db_ms += db_ms
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the ``q``th percentile (max_ms for the overflow bucket)."""
+        rank = q / 100 * self.requests
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return round(self.max_ms, 3)
+
+    def as_dict(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'mean_ms': round(self.total_ms / requests, 3),
+            'max_ms': round(self.max_ms, 3),
+            'mean_queries': round(self.queries / requests, 2),
+            'max_queries': self.max_queries,
+            'mean_db_ms': round(self.db_ms / requests, 3),
+            'histogram': {
+                **{f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                'overflow': self.buckets[-1],
+            },
+        }
+
+
+class RequestMetrics:
+    """
+    EndpointStats per ``METHOD route``, for at most METRICS_MAX_ENDPOINTS endpoints; requests
+    to any further ones (and to URLs that didn't resolve) are counted under ``other``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self.started_at = time.time()
+
+    def record(self, endpoint, elapsed_ms, queries, db_ms, error):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                if endpoint is None or len(self.endpoints) >= settings.METRICS_MAX_ENDPOINTS:
+                    endpoint = OTHER_ENDPOINTS
+                stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.add(elapsed_ms, queries, db_ms, error)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'since': self.started_at,
+                'sample_rate': settings.METRICS_SAMPLE_RATE,
+                'endpoints': {endpoint: stats.as_dict() for endpoint, stats in sorted(self.endpoints.items())},
+            }
+
+
+request_metrics = RequestMetrics()
+
+
+def endpoint_of(request):
+    match = getattr(request, 'resolver_match', None)
+    return f'{request.method} {match.route}' if match is not None else None
+
+
+class MetricsMiddleware:
+    """
+    Times sampled requests through the rest of the stack and records them in request_metrics.
+    Queries are counted through QueryUsage, so unsampled requests cost one random() call.
+    A streamed body is timed up to its first byte. Runs natively in sync and async stacks.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with QueryUsage().counting() as usage:
+            response = self.get_response(request)
+        return self.record(request, response, usage, started)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+        started = time.perf_counter()
+        with QueryUsage().counting() as usage:
+            response = await self.get_response(request)
+        return self.record(request, response, usage, started)
+
+    def record(self, request, response, usage, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        request_metrics.record(endpoint_of(request), elapsed_ms, usage.queries, usage.db_ms,
+                               error=response.status_code >= 500)
+        timings = [f'db;dur={usage.db_ms:.1f};desc="{usage.queries} queries"', f'total;dur={elapsed_ms:.1f}']
+        if response.has_header('Server-Timing'):
+            timings.insert(0, response['Server-Timing'])
+        response['Server-Timing'] = ', '.join(timings)
+        return response
+
+
+def silk_requested(request):
+    """
+    SILKY_INTERCEPT_FUNC: silk records only requests that send ``X-Silk-Profile: 1`` from staff,
+    signed in any way the API accepts (a session or a JWT bearer token).
+    """
+    if request.headers.get('X-Silk-Profile') != '1':
+        return False
+    # The authenticators are called directly: Request.user would also set the Django request's user.
+    drf_request = Request(request)
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(drf_request)
+        except APIException:
+            return False
+        if result is not None:
+            return result[0].is_staff
+    return False
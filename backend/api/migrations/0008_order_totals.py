@@ -0,0 +1,78 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:00
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+
+
+def snapshot_prices_and_totals(apps, schema_editor):
+    Order = apps.get_model("api", "Order")
+    OrderItem = apps.get_model("api", "OrderItem")
+    Product = apps.get_model("api", "Product")
+
+    OrderItem.objects.update(
+        unit_price=Subquery(
+            Product.objects.filter(pk=OuterRef("product_id")).values("price")[:1]
+        )
+    )
+    items = OrderItem.objects.filter(order=OuterRef("pk")).values("order")
+    Order.objects.update(
+        total_price=Subquery(
+            items.annotate(
+                total=Sum(F("unit_price") * F("quantity"), output_field=models.DecimalField())
+            ).values("total")[:1]
+        ),
+    )
+    Order.objects.filter(total_price__isnull=True).update(total_price=0)
+    Order.objects.update(
+        total_quantity=Subquery(
+            items.annotate(total=Sum("quantity")).values("total")[:1]
+        ),
+    )
+    Order.objects.filter(total_quantity__isnull=True).update(total_quantity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_remove_order_user_order_created_by_customer_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="total_price",
+            field=models.DecimalField(
+                db_index=True, decimal_places=2, max_digits=12, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total_quantity",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="unit_price",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.RunPython(snapshot_prices_and_totals, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="order",
+            name="total_price",
+            field=models.DecimalField(
+                db_index=True, decimal_places=2, default=0, max_digits=12
+            ),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="total_quantity",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="orderitem",
+            name="unit_price",
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 05:20
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def seed_monthly_revenue(apps, schema_editor):
+    Order = apps.get_model('api', 'Order')
+    MonthlyRevenue = apps.get_model('api', 'MonthlyRevenue')
+    rows = (
+        Order.objects
+        .annotate(month=TruncMonth('created_at'))
+        .values('month')
+        .annotate(revenue=Sum('total_price'), quantity=Sum('total_quantity'), order_count=Count('pk'))
+    )
+    MonthlyRevenue.objects.bulk_create([
+        MonthlyRevenue(
+            month=timezone.localtime(row['month']).date(),
+            revenue=row['revenue'] or 0,
+            quantity=row['quantity'] or 0,
+            order_count=row['order_count'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_order_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantity', models.IntegerField(default=0)),
+                ('order_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_monthly_revenue, migrations.RunPython.noop),
+    ]
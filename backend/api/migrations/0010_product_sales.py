@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-18 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def seed_product_sales(apps, schema_editor):
+    OrderItem = apps.get_model('api', 'OrderItem')
+    ProductSales = apps.get_model('api', 'ProductSales')
+    DailyProductSales = apps.get_model('api', 'DailyProductSales')
+    ProductSales.objects.bulk_create(
+        ProductSales(product_id=row['product'], total_sold=row['total_sold'])
+        for row in OrderItem.objects.values('product').annotate(total_sold=Sum('quantity'))
+    )
+    DailyProductSales.objects.bulk_create(
+        DailyProductSales(product_id=row['product'], day=row['day'], quantity=row['quantity'])
+        for row in (
+            OrderItem.objects
+            .annotate(day=TruncDate('order__created_at'))
+            .values('product', 'day')
+            .annotate(quantity=Sum('quantity'))
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_monthlyrevenue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='api.product')),
+                ('total_sold', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_sold', 'product'], name='productsales_leaderboard_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='api.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='dailyproductsales_day_product_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_product_sales, migrations.RunPython.noop),
+    ]
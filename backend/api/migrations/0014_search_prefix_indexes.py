@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:15
+
+from django.db import migrations
+
+# istartswith compiles to UPPER(col::text) LIKE UPPER('term%'); with text_pattern_ops the
+# planner can range-scan it whatever the database collation. Autocomplete uses it for input
+# shorter than a trigram. The SQLite FTS5 tables are installed after migrate by api.search.
+PREFIX_INDEXES = {
+    'product_name_prefix_idx': 'api_product',
+    'customer_name_prefix_idx': 'api_customer',
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in PREFIX_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} ((UPPER(name::text)) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
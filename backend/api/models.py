@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Upper
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.utils import timezone
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, first_name, last_name, phone_number, password=None, **extra_fields):
@@ -53,8 +56,16 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
     active = models.BooleanField(default=False)
-    
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(Upper('name'), name='product_name_upper_idx'),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['stock'], name='product_stock_idx'),
+            models.Index(fields=['stock'], condition=Q(active=True), name='product_active_stock_idx'),
+        ]
 
     @property
     def in_stock(self):
@@ -68,6 +79,13 @@ class Customer(models.Model):
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_customers', default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='customer_name_idx'),
+            models.Index(fields=['updated_at', 'id'], name='customer_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -85,10 +103,38 @@ class Order(models.Model):
     status = models.CharField(max_length=2, choices=StatusChoices.choices, default=StatusChoices.PENDING)
     created_at = models.DateTimeField(auto_now_add=True)
     product = models.ManyToManyField(Product, through='OrderItem', related_name='orders')
-
-    @property
-    def total_price(self):
-        return sum(item.Item_SubTotal for item in self.item.all())
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, db_index=True)
+    total_quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination walks orders newest first on this pair.
+            models.Index(fields=['created_at', 'order_id'], name='order_created_keyset_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['updated_at', 'order_id'], name='order_updated_idx'),
+        ]
+
+    def recalculate_totals(self):
+        """Refresh the stored totals from the item snapshots; call inside the transaction that wrote the items."""
+        from api.rollups import apply_revenue_delta
+
+        totals = self.item.aggregate(
+            total_price=Sum(F('unit_price') * F('quantity'), output_field=models.DecimalField()),
+            total_quantity=Sum('quantity'),
+        )
+        total_price = totals['total_price'] or 0
+        total_quantity = totals['total_quantity'] or 0
+        Order.objects.filter(pk=self.pk).update(
+            total_price=total_price, total_quantity=total_quantity, updated_at=timezone.now()
+        )
+        apply_revenue_delta(
+            self.created_at,
+            revenue=total_price - self.total_price,
+            quantity=total_quantity - self.total_quantity,
+        )
+        self.total_price = total_price
+        self.total_quantity = total_quantity
 
     def __str__(self):
         return f"Order {self.order_id} for {self.customer.name}"
@@ -98,10 +144,77 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='item', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=0)
+    # Price at the time the item was added, so later product edits don't rewrite past orders.
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['updated_at', 'id'], name='orderitem_updated_idx')]
 
     @property
     def Item_SubTotal(self):
-        return self.product.price * self.quantity
+        return self.unit_price * self.quantity
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the sales rollups currently count for this row; see api.signals.
+        instance._counted_sale = (instance.product_id, instance.quantity)
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name} in Order {self.order.order_id}"
+
+class MonthlyRevenue(models.Model):
+    """Per-month revenue rollup, kept in step with order writes by api.rollups."""
+    month = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantity = models.IntegerField(default=0)
+    order_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.month:%b %Y}: {self.revenue}"
+
+
+
+class ProductSales(models.Model):
+    """All-time units sold per product; the top-selling leaderboard reads this index."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='sales')
+    total_sold = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['-total_sold', 'product'], name='productsales_leaderboard_idx')]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.total_sold}"
+
+
+class DailyProductSales(models.Model):
+    """Units sold per product per order day, for windowed leaderboards."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['day', 'product'], name='dailyproductsales_day_product_uniq')]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id}: {self.quantity}"
+
+
+class Tombstone(models.Model):
+    """Marks a deleted row so /sync/ can tell clients to drop it; written by api.signals."""
+    table = models.CharField(max_length=32)
+    object_id = models.CharField(max_length=64)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['table', 'deleted_at'], name='tombstone_table_deleted_idx')]
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name} in Order {self.order.order_id}"
\ No newline at end of file
+        return f"{self.table} {self.object_id} deleted {self.deleted_at}"
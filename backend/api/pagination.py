@@ -1,13 +1,89 @@
-import requests 
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    LimitOffsetPagination,
+    PageNumberPagination,
+)
 
-page = 1
-hasNextPage = True 
 
-while hasNextPage:
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination seeks from the last row seen instead of using OFFSET, and skips the
+    COUNT(*), so page 10,000 costs the same as page 1. Needs an index matching ``ordering``.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class OrderKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-order_id')
+
+
+class PkKeysetPagination(KeysetPagination):
+    ordering = ('pk',)
+
+
+class SelectablePagination(BasePagination):
+    """
+    Uses ``default_class`` unless the request asks for keyset pages with ``?paginate=cursor``
+    (or is already following a ``?cursor=`` link), in which case ``keyset_class`` takes over.
+    """
+    default_class = PageNumberPagination
+    keyset_class = PkKeysetPagination
+    paginate_query_param = 'paginate'
+    cursor_query_param = 'cursor'
+
+    def __init__(self):
+        self.default = self.default_class()
+        self.keyset = self.keyset_class()
+        self.active = self.default
+
+    def __getattr__(self, name):
+        # Query parameter names and the like come from the legacy paginator.
+        if name in ('default', 'keyset', 'active'):
+            raise AttributeError(name)
+        return getattr(self.active, name)
+
+    def wants_keyset(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or params.get(self.paginate_query_param) == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.active = self.keyset if self.wants_keyset(request) else self.default
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.default.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.default.get_schema_operation_parameters(view) + [{
+            'name': self.paginate_query_param,
+            'required': False,
+            'in': 'query',
+            'description': "Set to 'cursor' for keyset pagination.",
+            'schema': {'type': 'string', 'enum': ['cursor']},
+        }] + self.keyset.get_schema_operation_parameters(view)
+
+    def to_html(self):
+        return self.active.to_html()
+
+
+class OrderPagination(SelectablePagination):
+    default_class = LimitOffsetPagination
+    keyset_class = OrderKeysetPagination
+
+
+if __name__ == '__main__':
+    # Walks the product catalogue by following `next` links; keyset pages stay fast however deep it goes.
+    import requests
+
     endpoint = "http://localhost:8000/products/"
-    params = {'page': page}
-    data = requests.get(endpoint, params=params).json()
-    print(data['next'])
-    if not data['next']:
-        hasNextPage = False
-    page += 1
\ No newline at end of file
+    params = {'paginate': 'cursor'}
+
+    while endpoint:
+        data = requests.get(endpoint, params=params).json()
+        print(data['next'])
+        endpoint, params = data['next'], None
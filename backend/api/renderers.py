@@ -0,0 +1,100 @@
+from collections.abc import Iterator
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional: without it rendering stays on the stdlib encoder
+    orjson = None
+
+STREAM_CHUNK_SIZE = 2000
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson when it is installed, producing the same bytes: UUIDs, dates and
+    datetimes natively (UTC as ``Z``), Decimals as floats and anything else through DRF's
+    encoder. Indented output (the browsable API, ``; indent=``) still goes through ``json``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or '', renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return encode(data)
+
+
+def encode(data):
+    """``data`` as compact UTF-8 JSON, as the configured JSONRenderer would write it."""
+    if orjson is None:
+        return JSONRenderer().render(data)
+    try:
+        content = orjson.dumps(
+            data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_SUBCLASS,
+        )
+    except TypeError:
+        # Integers beyond 64 bits and the like: let the stdlib encoder have it.
+        return JSONRenderer().render(data)
+    # Same escaping as JSONRenderer, so the output can be embedded in a <script>.
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+_drf_encoder = JSONEncoder()
+
+
+def _default(value):
+    # Subclasses of builtins are passed through to here: some, like the UserList behind form
+    # errors, keep their items outside the storage orjson would read.
+    if isinstance(value, str):
+        return str(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return _drf_encoder.default(value)
+
+
+def iter_json(value, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Encode ``value`` piece by piece. Iterators and querysets, at the top level or as values of
+    a top-level dict, become arrays written ``chunk_size`` items at a time, so they are never
+    held in memory whole; everything else is encoded in one go.
+    """
+    if isinstance(value, dict) and any(_streams(item) for item in value.values()):
+        separator = b'{'
+        for key, item in value.items():
+            yield separator + encode(str(key)) + b':'
+            yield from iter_json(item, chunk_size)
+            separator = b','
+        yield b'}'
+    elif _streams(value):
+        iterator = value.iterator(chunk_size=chunk_size) if isinstance(value, QuerySet) else value
+        opening, chunk = b'[', []
+        for item in iterator:
+            chunk.append(encode(item))
+            if len(chunk) == chunk_size:
+                yield opening + b','.join(chunk)
+                opening, chunk = b',', []
+        yield (opening + b','.join(chunk) if chunk or opening == b'[' else b'') + b']'
+    else:
+        yield encode(value)
+
+
+def _streams(value):
+    return isinstance(value, (Iterator, QuerySet))
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """A JSON body written by iter_json() while the rows are still being fetched."""
+
+    def __init__(self, data, chunk_size=STREAM_CHUNK_SIZE, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(iter_json(data, chunk_size), **kwargs)
@@ -0,0 +1,175 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from django.utils.dateformat import DateFormat
+
+from api.models import DailyProductSales, MonthlyRevenue, Order, OrderItem, Product, ProductSales
+
+TOP_SELLING_WINDOWS = (7, 30, 90)
+
+
+def month_of(created_at):
+    """First day of the month ``created_at`` falls in, in the current timezone (matches TruncMonth)."""
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def apply_revenue_delta(created_at, revenue=0, quantity=0, orders=0):
+    """Shift the rollup row for ``created_at``'s month by the given amounts."""
+    if not (revenue or quantity or orders):
+        return
+    month = month_of(created_at)
+    MonthlyRevenue.objects.get_or_create(month=month)
+    MonthlyRevenue.objects.filter(month=month).update(
+        revenue=F('revenue') + revenue,
+        quantity=F('quantity') + quantity,
+        order_count=F('order_count') + orders,
+    )
+
+
+def rebuild_monthly_revenue():
+    """Recompute every rollup row from the orders table."""
+    rows = (
+        Order.objects
+        .annotate(month=TruncMonth('created_at'))
+        .values('month')
+        .annotate(revenue=Sum('total_price'), quantity=Sum('total_quantity'), order_count=Count('pk'))
+        .order_by('month')
+    )
+    with transaction.atomic():
+        MonthlyRevenue.objects.all().delete()
+        return len(MonthlyRevenue.objects.bulk_create([
+            MonthlyRevenue(
+                month=timezone.localtime(row['month']).date(),
+                revenue=row['revenue'] or 0,
+                quantity=row['quantity'] or 0,
+                order_count=row['order_count'],
+            )
+            for row in rows
+        ]))
+
+
+def revenue_months():
+    return MonthlyRevenue.objects.filter(order_count__gt=0).order_by('month')
+
+
+def monthly_revenue_series(months=None):
+    """Chart points for every month with orders (or just ``months``), oldest first."""
+    return [
+        {'label': DateFormat(entry.month).format('M Y'), 'value': entry.revenue}
+        for entry in (revenue_months() if months is None else months)
+    ]
+
+
+def per_row_value(values, *fields):
+    """
+    An integer expression worth ``values[key]`` on the row whose ``fields`` (default pk) equal
+    ``key`` (a tuple when there are several fields) and 0 on any other row, for updating many rows
+    by different amounts in one statement. It is a single flat CASE: an OR of one condition per
+    row would outgrow SQLite's expression depth limit at around a thousand rows.
+    """
+    fields = fields or ('pk',)
+    return Case(
+        *(
+            When(**dict(zip(fields, key if len(fields) > 1 else (key,))), then=Value(value))
+            for key, value in values.items()
+        ),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def apply_sales_delta(product_id, created_at, quantity):
+    """
+    Add ``quantity`` (may be negative) units sold of a product on ``created_at``'s day. A negative
+    amount only takes back sales that were counted, so it never creates counter rows.
+    """
+    if not quantity:
+        return
+    day = timezone.localtime(created_at).date()
+    if quantity > 0:
+        ProductSales.objects.get_or_create(product_id=product_id)
+        DailyProductSales.objects.get_or_create(product_id=product_id, day=day)
+    ProductSales.objects.filter(product_id=product_id).update(total_sold=F('total_sold') + quantity)
+    DailyProductSales.objects.filter(product_id=product_id, day=day).update(quantity=F('quantity') + quantity)
+
+
+def apply_sales_deltas(sales):
+    """
+    Add ``sales[product_id, day]`` new units sold for many products at once: one INSERT per
+    counter table for the rows that don't exist yet and one UPDATE each to add the amounts,
+    however many products the sales cover.
+    """
+    sales = {key: quantity for key, quantity in sales.items() if quantity}
+    if not sales:
+        return
+    totals = Counter()
+    for (product_id, _), quantity in sales.items():
+        totals[product_id] += quantity
+    ProductSales.objects.bulk_create(
+        [ProductSales(product_id=product_id) for product_id in totals], ignore_conflicts=True
+    )
+    DailyProductSales.objects.bulk_create(
+        [DailyProductSales(product_id=product_id, day=day) for product_id, day in sales], ignore_conflicts=True
+    )
+    ProductSales.objects.filter(product_id__in=totals).update(
+        total_sold=F('total_sold') + per_row_value(totals, 'product_id')
+    )
+    DailyProductSales.objects.filter(product_id__in=totals, day__in={day for _, day in sales}).update(
+        quantity=F('quantity') + per_row_value(sales, 'product_id', 'day')
+    )
+
+
+def rebuild_product_sales():
+    """Recompute the all-time and daily product sales counters from the order items."""
+    totals = OrderItem.objects.values('product').annotate(total_sold=Sum('quantity'))
+    daily = (
+        OrderItem.objects
+        .annotate(day=TruncDate('order__created_at'))
+        .values('product', 'day')
+        .annotate(quantity=Sum('quantity'))
+    )
+    with transaction.atomic():
+        ProductSales.objects.all().delete()
+        DailyProductSales.objects.all().delete()
+        ProductSales.objects.bulk_create(
+            ProductSales(product_id=row['product'], total_sold=row['total_sold']) for row in totals
+        )
+        DailyProductSales.objects.bulk_create(
+            DailyProductSales(product_id=row['product'], day=row['day'], quantity=row['quantity'])
+            for row in daily
+        )
+        return ProductSales.objects.count()
+
+
+def top_selling_products(limit=5, days=None):
+    """
+    Best sellers with a ``total_sold`` attribute, highest first and ties broken by id.
+    ``days`` restricts the ranking to the trailing window of daily counters.
+    """
+    if days is None:
+        ranking = (
+            ProductSales.objects
+            .filter(total_sold__gt=0)
+            .order_by('-total_sold', 'product')
+            .values_list('product', 'total_sold')[:limit]
+        )
+    else:
+        since = timezone.localdate() - timedelta(days=days - 1)
+        ranking = (
+            DailyProductSales.objects
+            .filter(day__gte=since)
+            .values('product')
+            .annotate(total_sold=Sum('quantity'))
+            .filter(total_sold__gt=0)
+            .order_by('-total_sold', 'product')
+            .values_list('product', 'total_sold')[:limit]
+        )
+    ranking = list(ranking)
+    products = Product.objects.in_bulk([product_id for product_id, _ in ranking])
+    for product_id, total_sold in ranking:
+        products[product_id].total_sold = total_sold
+    return [products[product_id] for product_id, _ in ranking]
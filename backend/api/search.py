@@ -0,0 +1,146 @@
+import re
+
+from django.db import OperationalError, connection, connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+from rest_framework import filters
+
+from api.models import Customer, Product
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+# Trigram indexes need three characters to narrow anything; shorter input is matched as a prefix.
+TRIGRAM_MIN_LENGTH = 3
+# FTS hits scored by bm25 per autocomplete call. Scoring every hit of a short prefix costs ~200 ms
+# at a million rows; longer input narrows the hits below this and is ranked in full.
+FTS_RANKED_CANDIDATES = 500
+
+
+class SearchIndex:
+    """
+    Name search for one table. ``?search=`` (filter) keeps SearchFilter's substring meaning,
+    which PostgreSQL answers from the pg_trgm index on UPPER(name). Autocomplete also uses the
+    text_pattern_ops prefix index there, and on SQLite an FTS5 table kept in step by triggers
+    (see install_fts); other backends fall back to plain icontains.
+    """
+
+    def __init__(self, model, field='name'):
+        self.model = model
+        self.field = field
+        self.table = model._meta.db_table
+        self.fts_table = f'{self.table}_search'
+        self._fts_found = set()
+
+    def uses_fts(self):
+        if connection.vendor != 'sqlite':
+            return False
+        if connection.alias not in self._fts_found and self.fts_table in fts_tables():
+            self._fts_found.add(connection.alias)
+        return connection.alias in self._fts_found
+
+    def filter(self, queryset, text):
+        """
+        Rows where every term of ``text`` (split as SearchFilter splits it) is part of the name
+        or of the id, as SearchFilter with ``search_fields = ['id', 'name']`` matched them. Only
+        all-digit terms are tried against the id, so other terms stay on the name index.
+        """
+        for term in filters.search_smart_split(text):
+            condition = Q(**{f'{self.field}__icontains': term})
+            if term.isdigit():
+                condition |= Q(pk__icontains=term)
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def autocomplete(self, text, limit=AUTOCOMPLETE_LIMIT):
+        """
+        At most ``limit`` rows, best match first: exact name, then names starting with the
+        text, then the rest; shorter names win ties. SQLite ranks FTS word-prefix hits by bm25,
+        over the first FTS_RANKED_CANDIDATES of them.
+        """
+        text = text.strip()
+        words = re.findall(r'\w+', text)
+        if not words:
+            return []
+        if self.uses_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT rowid FROM (SELECT rowid, rank FROM {self.fts_table} WHERE {self.fts_table} MATCH %s '
+                    f'LIMIT %s) ORDER BY rank LIMIT %s',
+                    [fts_query(words), FTS_RANKED_CANDIDATES, limit],
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+            found = self.model.objects.in_bulk(ids)
+            return [found[pk] for pk in ids if pk in found]
+
+        lookup = 'icontains' if len(text) >= TRIGRAM_MIN_LENGTH else 'istartswith'
+        return list(
+            self.model.objects
+            .filter(**{f'{self.field}__{lookup}': text})
+            .annotate(search_rank=Case(
+                When(**{f'{self.field}__iexact': text}, then=Value(0)),
+                When(**{f'{self.field}__istartswith': text}, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            ))
+            .order_by('search_rank', Length(self.field), 'pk')[:limit]
+        )
+
+
+def fts_query(words):
+    """Every word as a quoted prefix term, so ``wid gad`` matches "Widget Gadget"."""
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def fts_tables():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_search' ESCAPE '\\'")
+        return {row[0] for row in cursor.fetchall()}
+
+
+product_search = SearchIndex(Product)
+customer_search = SearchIndex(Customer)
+
+
+def install_fts(using=None, **kwargs):
+    """
+    Create the SQLite FTS5 tables and their sync triggers where missing, then index existing
+    rows. Runs after every migrate, because SQLite migrations that rebuild a table drop its triggers.
+    """
+    db = connections[using or 'default']
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        for index in (product_search, customer_search):
+            table, fts, field = index.table, index.fts_table, index.field
+            triggers = {
+                f'{fts}_ai': f"AFTER INSERT ON {table} BEGIN "
+                             f"INSERT INTO {fts}(rowid, {field}) VALUES (new.id, new.{field}); END",
+                f'{fts}_ad': f"AFTER DELETE ON {table} BEGIN "
+                             f"INSERT INTO {fts}({fts}, rowid, {field}) VALUES ('delete', old.id, old.{field}); END",
+                f'{fts}_au': f"AFTER UPDATE OF {field} ON {table} BEGIN "
+                             f"INSERT INTO {fts}({fts}, rowid, {field}) VALUES ('delete', old.id, old.{field}); "
+                             f"INSERT INTO {fts}(rowid, {field}) VALUES (new.id, new.{field}); END",
+            }
+            if table not in existing or (fts in existing and existing.issuperset(triggers)):
+                continue
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"{field}, content='{table}', content_rowid='id', prefix='1 2 3')"
+                )
+            except OperationalError:
+                return  # SQLite built without FTS5: searches fall back to icontains
+            for name, body in triggers.items():
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """``?search=`` through the view's ``search_index``, so the async list path matches the same rows."""
+
+    def filter_queryset(self, request, queryset, view):
+        if not self.get_search_terms(request):
+            return queryset
+        return view.search_index.filter(queryset, request.query_params[self.search_param])
@@ -1,9 +1,13 @@
+from collections import Counter
+
 from rest_framework import serializers
 from .models import User ,Product, Order, OrderItem, Customer
 from django.db import transaction
+from django.db.models import Prefetch
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from drf_writable_nested.serializers import WritableNestedModelSerializer
+from api.inventory import held_stock, restock
 
 
 User = get_user_model()
@@ -40,7 +44,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name')
-    product_price = serializers.DecimalField(max_digits=10, decimal_places=2, source='product.price')
+    product_price = serializers.DecimalField(max_digits=10, decimal_places=2, source='unit_price')
     # product_description = serializers.TimeField(source='product.description')
     class Meta:
         model = OrderItem
@@ -64,7 +68,7 @@ class ProductSalesSerializer(serializers.ModelSerializer):
 
 class OrderItemDetailSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name')
-    product_price = serializers.DecimalField(max_digits=10, decimal_places=2, source='product.price')
+    product_price = serializers.DecimalField(max_digits=10, decimal_places=2, source='unit_price')
 
     class Meta:
         model = OrderItem
@@ -76,7 +80,7 @@ class OrderItemDetailSerializer(serializers.ModelSerializer):
 
 
 class OrderInfoSerializer(serializers.ModelSerializer):
-    items = OrderItemDetailSerializer(source='orderitem_set', many=True, read_only=True)
+    items = OrderItemDetailSerializer(source='item', many=True, read_only=True)
 
     class Meta:
         model = Order
@@ -93,8 +97,19 @@ class CustomerSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_OrderCount(self, obj):
+        # Served from the prefetch cache when setup_eager_loading() was used.
         return obj.orders.count()
-    
+
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=''):
+        """Prefetch everything the nested order history reads, in a fixed number of queries."""
+        return queryset.prefetch_related(
+            Prefetch(
+                f'{prefix}orders',
+                queryset=Order.objects.prefetch_related('item__product'),
+            )
+        )
+
 
 
 # class OrderItemCreateSerializer(serializers.ModelSerializer):
@@ -171,6 +186,13 @@ class OrderItemCreateSerializer(serializers.ModelSerializer):
         model = OrderItem
        
         fields = ('id', 'product', 'quantity') 
+
+    def update(self, instance, validated_data):
+        # Swapping the product re-snapshots its current price; quantity edits keep the original one.
+        product = validated_data.get('product')
+        if product is not None and product.pk != instance.product_id:
+            validated_data['unit_price'] = product.price
+        return super().update(instance, validated_data)
         
         
 class OrderCreateSerializer(WritableNestedModelSerializer):
@@ -188,6 +210,37 @@ class OrderCreateSerializer(WritableNestedModelSerializer):
         )
         read_only_fields = ('order_id', 'created_by')
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            order = super().create(validated_data)
+            order.recalculate_totals()
+            restock(order, previously_held=Counter())
+        return order
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            # Item edits, removals and status changes all reduce to a diff of the stock held.
+            previously_held = held_stock(instance)
+            order = super().update(instance, validated_data)
+            order.recalculate_totals()
+            restock(order, previously_held)
+        return order
+
+
+class OrderBulkItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class OrderBulkSerializer(serializers.Serializer):
+    """
+    One order of a /orders/bulk/ batch. Ids are only shape-checked here; api.bulk.create_orders
+    resolves every product and customer in the batch with one query each.
+    """
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Order.StatusChoices.choices, default=Order.StatusChoices.PENDING)
+    item = OrderBulkItemSerializer(many=True)
+
 
 
 
@@ -289,24 +342,66 @@ class OrderSerializer(serializers.ModelSerializer):
     order_id = serializers.UUIDField(read_only=True)
     item=OrderItemSerializer(many=True, read_only=True)
     customer = CustomerSerializer(read_only=True)
-    total_price = serializers.SerializerMethodField()
-    total_quantity = serializers.SerializerMethodField()
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True, coerce_to_string=False)
+    total_quantity = serializers.IntegerField(read_only=True)
     class Meta:
         model = Order
         fields = '__all__'
 
-    def get_total_price(self, obj):
-        return sum(item.Item_SubTotal for item in obj.item.all())
-    def get_total_quantity(self, obj):
-        return sum(item.quantity for item in obj.item.all())
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Query plan for list/retrieve: constant query count regardless of page size."""
+        queryset = queryset.select_related('customer').prefetch_related('item__product', 'product')
+        return CustomerSerializer.setup_eager_loading(queryset, prefix='customer__')
    
     
    
 
 
+class CustomerSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Customer
+        fields = ['id', 'name']
+
+
+class ProductOptionSerializer(serializers.ModelSerializer):
+    # Autocomplete rows: what the order form's product picker shows.
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'price']
+
+
+class CustomerOptionSerializer(serializers.ModelSerializer):
+    # Autocomplete rows: the customer without its order history.
+    class Meta:
+        model = Customer
+        fields = ['id', 'name', 'email', 'phone_number']
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Flat order row for list callers that do not need items or customer history."""
+    customer = CustomerSummarySerializer(read_only=True)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True, coerce_to_string=False)
+
+    class Meta:
+        model = Order
+        fields = ['order_id', 'status', 'created_at', 'created_by', 'customer', 'total_price', 'total_quantity']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('customer').only(
+            'order_id', 'status', 'created_at', 'created_by_id', 'total_price', 'total_quantity',
+            'customer__id', 'customer__name',
+        )
+
+
 class ProductInfoSerializer(serializers.Serializer):
-    products = ProductSerializer(many=True)
     count = serializers.IntegerField()
-    max_price = serializers.FloatField()
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    avg_price = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    stock_value = serializers.DecimalField(max_digits=16, decimal_places=2, coerce_to_string=False)
+    low_stock_count = serializers.IntegerField()
+    products = serializers.DictField(required=False)  # a paginated page, only with ?embed=products
 
 
@@ -1,19 +1,125 @@
-# from django.db.models.signals import post_save, post_delete
-# from django.dispatch import receiver
-# from api.models import Product
-# from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.dispatch import receiver
+from api.cache import order_cache, product_cache
+from api.inventory import adjust_stock, held_stock
+from api.models import Customer, Order, OrderItem, Product, Tombstone
+from api.rollups import apply_revenue_delta, apply_sales_delta
+from api.sync import table_label
+from api.typeahead import product_names
 
 
-# @receiver([post_save, post_delete], sender=Product)
-# def invalidate_product_cache(sender, instance, **kwargs):
-#     """
-#     Invalidate product list caches when a product is created, updated, or deleted
-#     """
-#     print("Clearing product cache")
-    
-   
-#     cache.delete_pattern('*product_list*')
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    """
+    Invalidate product caches when a product is created, updated, or deleted
+    """
+    product_cache.invalidate()
 
 
+@receiver([post_save, post_delete], sender=Product)
+def update_product_names(sender, instance, signal, **kwargs):
+    """
+    Keep this worker's typeahead index current once the write commits; other workers catch up on refresh
+    """
+    if not (settings.PRODUCT_NAME_INDEX and product_names.built):
+        return
+    if signal is post_delete:
+        pk = instance.pk  # the deletion clears instance.pk before on_commit runs
+        transaction.on_commit(lambda: product_names.discard(pk))
+    else:
+        transaction.on_commit(lambda: product_names.put(instance))
 
-    
\ No newline at end of file
+
+@receiver([post_save, post_delete], sender=Order)
+@receiver([post_save, post_delete], sender=OrderItem)
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_order_cache(sender, instance, **kwargs):
+    """
+    Order listings embed customers, items and product names, so any of them changing retires the cache
+    """
+    order_cache.invalidate()
+
+
+@receiver(post_save, sender=Order)
+def count_order_in_rollup(sender, instance, created, **kwargs):
+    """
+    Totals start at zero; Order.recalculate_totals() adds the revenue once items exist
+    """
+    if created:
+        apply_revenue_delta(instance.created_at, orders=1)
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_rollup(sender, instance, **kwargs):
+    apply_revenue_delta(
+        instance.created_at,
+        revenue=-instance.total_price,
+        quantity=-instance.total_quantity,
+        orders=-1,
+    )
+
+
+@receiver(pre_delete, sender=Order)
+def release_order_stock(sender, instance, **kwargs):
+    """
+    Put back what the order was holding while its items still exist
+    """
+    adjust_stock({product_id: -quantity for product_id, quantity in held_stock(instance).items()})
+
+
+@receiver(pre_delete, sender=Product)
+def find_orders_holding_product(sender, instance, **kwargs):
+    """
+    The product's items are cascaded away with it; remember whose totals they count towards
+    """
+    instance._orders_losing_items = list(Order.objects.filter(item__product=instance).distinct())
+
+
+@receiver(post_delete, sender=Product)
+def recalculate_orders_without_product(sender, instance, **kwargs):
+    """
+    The items are gone by now, so this takes them out of the order totals and the revenue rollup
+    """
+    for order in getattr(instance, '_orders_losing_items', ()):
+        order.recalculate_totals()
+
+
+@receiver(post_save, sender=OrderItem)
+def count_item_sales(sender, instance, created, **kwargs):
+    counted = None if created else getattr(instance, '_counted_sale', None)
+    current = (instance.product_id, instance.quantity)
+    if counted == current:
+        return
+    created_at = instance.order.created_at
+    if counted is not None:
+        apply_sales_delta(counted[0], created_at, -counted[1])
+    apply_sales_delta(current[0], created_at, current[1])
+    instance._counted_sale = current
+
+
+def deleting_products(origin):
+    """Whether a delete started from products, whose counters are cascaded away with them."""
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) is Product
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_item_sales(sender, instance, origin=None, **kwargs):
+    if deleting_products(origin):
+        return
+    product_id, quantity = getattr(instance, '_counted_sale', (instance.product_id, instance.quantity))
+    apply_sales_delta(product_id, instance.order.created_at, -quantity)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=OrderItem)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Lets /sync/ clients drop rows that no longer exist
+    """
+    Tombstone.objects.create(table=table_label(sender), object_id=str(instance.pk))
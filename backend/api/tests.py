@@ -1,27 +1,1560 @@
-from django.test import TestCase
-from api.models import Order, User
-from django.urls import reverse
+import importlib
+import json
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, clear_url_caches, resolve
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.budgets import QueryBudget, QueryBudgetExceeded, QueryBudgetMiddleware, QueryUsage
+from api.cache import order_cache, product_cache
+from api.compiled import CompiledSerializer
+from api.filter import ProductFilter
+from api.renderers import FastJSONRenderer, StreamingJSONResponse, iter_json
+from api.inventory import InsufficientStock, adjust_stock
+from api.metrics import LATENCY_BUCKETS_MS, MetricsMiddleware, request_metrics, silk_requested
+from api.management.commands.benchmark_api import endpoint_cases
+from api.management.commands.seed_data import seed
+from api.models import Customer, DailyProductSales, MonthlyRevenue, Order, OrderItem, Product, ProductSales, Tombstone, User
+from api.rollups import rebuild_monthly_revenue, rebuild_product_sales
+from api.search import product_search
+from api.serializers import (
+    CustomerSerializer,
+    OrderSerializer,
+    OrderSummarySerializer,
+    ProductOptionSerializer,
+    ProductSerializer,
+)
+from api.sync import encode_token
+from api.typeahead import product_names
+from api.views import ProductInfoAPIView
+
+
+# Silk records every query it sees, which would drown out the ones under test.
+API_MIDDLEWARE = [m for m in settings.MIDDLEWARE if not m.startswith('silk.')]
 
 
 class UserOrderTestCase(TestCase):
+    # Orders belong to the user who created them (created_by); there is no per-user order URL any more.
     def setUp(self):
-        user1 = User.objects.create_user(username='user1', password='test')
-        user2 = User.objects.create_user(username='user2', password='test')
-        Order.objects.create(user=user1)
-        Order.objects.create(user=user1)
-        Order.objects.create(user=user2)
-        Order.objects.create(user=user2)
+        cache.clear()
+        user1 = User.objects.create_user('user1@example.com', 'User', 'One', '5550000101', password='test')
+        user2 = User.objects.create_user('user2@example.com', 'User', 'Two', '5550000102', password='test')
+        Order.objects.create(created_by=user1)
+        Order.objects.create(created_by=user1)
+        Order.objects.create(created_by=user2)
+        Order.objects.create(created_by=user2)
 
-    def test_user_order_endpoint_retrieves_only_authenticated_user_orders(self):
-        user = User.objects.get(username='user2')
+    def test_orders_are_attributed_to_the_authenticated_user(self):
+        user = User.objects.get(email='user2@example.com')
         self.client.force_login(user)
-        response = self.client.get(reverse('user-orders'))
+        response = self.client.post('/orders/', {'item': []}, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.get(pk=response.json()['order_id']).created_by, user)
+        self.assertEqual(Order.objects.filter(created_by=user).count(), 3)
+
+    def test_bulk_orders_require_authentication(self):
+        response = self.client.post('/orders/bulk/', [], content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class OrderQueryPlanTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'owner@example.com', 'Owner', 'User', '5550000000', password='test'
+        )
+        self.product = Product.objects.create(name='Widget', description='', price='2.50', stock=100)
+        self.other_product = Product.objects.create(name='Gadget', description='', price='4.00', stock=100)
+
+    def create_orders(self, count):
+        for _ in range(count):
+            i = Customer.objects.count()
+            customer = Customer.objects.create(
+                name=f'Customer {i}', email=f'customer{i}@example.com', created_by=self.user
+            )
+            for _ in range(2):
+                order = Order.objects.create(customer=customer, created_by=self.user)
+                OrderItem.objects.create(order=order, product=self.product, quantity=2)
+                OrderItem.objects.create(order=order, product=self.other_product, quantity=1)
+                order.recalculate_totals()
+
+    def list_orders(self):
+        response = self.client.get('/orders/', {'limit': 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_order_list_query_count_is_constant(self):
+        self.create_orders(1)
+        with CaptureQueriesContext(connection) as small_page:
+            self.list_orders()
+
+        self.create_orders(20)
+        with CaptureQueriesContext(connection) as large_page:
+            data = self.list_orders()
+
+        self.assertEqual(data['count'], 42)
+        self.assertEqual(len(large_page), len(small_page))
+
+    def test_order_list_embeds_customer_history(self):
+        self.create_orders(1)
+        order = self.list_orders()['results'][0]
+
+        self.assertEqual(order['customer']['OrderCount'], 2)
+        self.assertEqual(len(order['customer']['OrderDetail']), 2)
+        self.assertEqual(len(order['customer']['OrderDetail'][0]['items']), 2)
+        self.assertEqual(order['total_price'], 9.0)
+        self.assertEqual(order['total_quantity'], 3)
+
+    def test_order_retrieve_query_count(self):
+        self.create_orders(3)
+        order = Order.objects.first()
+        # validators, order + items + products + product ids, customer history + items + products
+        with self.assertNumQueries(8):
+            response = self.client.get(f'/orders/{order.order_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_customer_list_query_count_is_constant(self):
+        self.create_orders(1)
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get('/customers/')
+
+        self.create_orders(4)
+        with CaptureQueriesContext(connection) as large_page:
+            response = self.client.get('/customers/')
+
+        self.assertEqual(response.json()['count'], 5)
+        self.assertEqual(len(large_page), len(small_page))
+
+    def test_order_list_count_view_is_only_a_count(self):
+        self.create_orders(3)
+        with self.assertNumQueries(2):  # the validators' newest-write lookup, then the count
+            response = self.client.get('/orders/', {'view': 'count'})
+        self.assertEqual(response.json(), {'count': 6})
+
+    def test_order_list_summary_view(self):
+        self.create_orders(1)
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get('/orders/', {'view': 'summary'})
+
+        self.create_orders(5)
+        with CaptureQueriesContext(connection) as large_page:
+            response = self.client.get('/orders/', {'view': 'summary', 'limit': 100})
+
+        order = response.json()['results'][0]
+        self.assertEqual(set(order), {
+            'order_id', 'status', 'created_at', 'created_by', 'customer', 'total_price', 'total_quantity',
+        })
+        self.assertEqual(set(order['customer']), {'id', 'name'})
+        self.assertEqual(order['total_price'], 9.0)
+        self.assertEqual(order['total_quantity'], 3)
+        self.assertEqual(len(large_page), len(small_page))
+
+    def test_order_list_rejects_unknown_view(self):
+        response = self.client.get('/orders/', {'view': 'everything'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class OrderApiTestCase(TestCase):
+    """Shared fixtures for tests that drive orders through the API."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'clerk@example.com', 'Clerk', 'User', '5550000001', password='test'
+        )
+        self.client.force_login(self.user)
+        self.customer = Customer.objects.create(name='Acme', email='acme@example.com', created_by=self.user)
+        self.product = Product.objects.create(name='Widget', description='', price='2.50', stock=100)
+        self.other_product = Product.objects.create(name='Gadget', description='', price='4.00', stock=100)
+
+    def create_order(self):
+        response = self.client.post('/orders/', {
+            'customer': self.customer.pk,
+            'item': [
+                {'product': self.product.pk, 'quantity': 2},
+                {'product': self.other_product.pk, 'quantity': 1},
+            ],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.content)
+        return Order.objects.get(pk=response.json()['order_id'])
+
+
+class OrderTotalsTestCase(OrderApiTestCase):
+    def test_create_persists_totals_and_price_snapshots(self):
+        order = self.create_order()
+
+        self.assertEqual(order.total_price, Decimal('9.00'))
+        self.assertEqual(order.total_quantity, 3)
+        self.assertEqual(
+            sorted(order.item.values_list('unit_price', flat=True)), [Decimal('2.50'), Decimal('4.00')]
+        )
+
+    def test_product_price_change_does_not_rewrite_old_orders(self):
+        order = self.create_order()
+        Product.objects.filter(pk=self.product.pk).update(price='100.00')
+
+        response = self.client.get(f'/orders/{order.order_id}/')
+        self.assertEqual(response.json()['total_price'], 9.0)
+        self.assertEqual(response.json()['item'][0]['product_price'], '2.50')
+
+    def test_patch_and_put_keep_totals_in_sync(self):
+        order = self.create_order()
+        items = {item.product_id: item for item in order.item.all()}
+
+        response = self.client.patch(f'/orders/{order.order_id}/', {
+            'item': [
+                {'id': items[self.product.pk].pk, 'product': self.product.pk, 'quantity': 4},
+                {'id': items[self.other_product.pk].pk, 'product': self.other_product.pk, 'quantity': 1},
+            ],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        order.refresh_from_db()
+        self.assertEqual((order.total_price, order.total_quantity), (Decimal('14.00'), 5))
+
+        response = self.client.put(f'/orders/{order.order_id}/', {
+            'customer': self.customer.pk,
+            'status': Order.StatusChoices.PENDING,
+            'item': [{'product': self.other_product.pk, 'quantity': 3}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        order.refresh_from_db()
+        self.assertEqual((order.total_price, order.total_quantity), (Decimal('12.00'), 3))
+
+    def test_revenue_endpoints_sum_stored_totals(self):
+        self.create_order()
+        self.create_order()
+
+        response = self.client.get('/orders/month-revenue/')
+        self.assertEqual(response.json(), {'total_revenue': 18.0})
+        response = self.client.get('/orders/monthly-revenue/')
+        self.assertEqual([entry['value'] for entry in response.json()], [18.0])
+
+
+
+class StockReservationTestCase(OrderApiTestCase):
+    def stock(self):
+        return dict(Product.objects.values_list('name', 'stock'))
+
+    def test_create_update_cancel_and_delete_move_stock(self):
+        order = self.create_order()
+        self.assertEqual(self.stock(), {'Widget': 98, 'Gadget': 99})
+
+        items = {item.product_id: item for item in order.item.all()}
+        self.client.patch(f'/orders/{order.order_id}/', {
+            'item': [
+                {'id': items[self.product.pk].pk, 'product': self.product.pk, 'quantity': 5},
+                {'id': items[self.other_product.pk].pk, 'product': self.other_product.pk, 'quantity': 1},
+            ],
+        }, content_type='application/json')
+        self.assertEqual(self.stock(), {'Widget': 95, 'Gadget': 99})
+
+        self.client.put(f'/orders/{order.order_id}/', {
+            'customer': self.customer.pk,
+            'status': Order.StatusChoices.PENDING,
+            'item': [{'product': self.other_product.pk, 'quantity': 3}],
+        }, content_type='application/json')
+        self.assertEqual(self.stock(), {'Widget': 100, 'Gadget': 97})
+
+        self.client.patch(f'/orders/{order.order_id}/', {'status': Order.StatusChoices.CANCELLED},
+                          content_type='application/json')
+        self.assertEqual(self.stock(), {'Widget': 100, 'Gadget': 100})
+        self.client.patch(f'/orders/{order.order_id}/', {'status': Order.StatusChoices.PENDING},
+                          content_type='application/json')
+        self.assertEqual(self.stock(), {'Widget': 100, 'Gadget': 97})
+
+        self.client.delete(f'/orders/{order.order_id}/')
+        self.assertEqual(self.stock(), {'Widget': 100, 'Gadget': 100})
+
+    def test_order_beyond_stock_is_rejected_without_side_effects(self):
+        Product.objects.filter(pk=self.other_product.pk).update(stock=1)
+        response = self.client.post('/orders/', {
+            'customer': self.customer.pk,
+            'item': [
+                {'product': self.product.pk, 'quantity': 100},
+                {'product': self.other_product.pk, 'quantity': 2},
+            ],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'item': ['Not enough stock for Gadget (1 left, 2 requested).']})
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(), {'Widget': 100, 'Gadget': 1})
+
+    def test_bulk_orders_reserve_stock_for_the_whole_batch(self):
+        payload = [{'item': [{'product': self.product.pk, 'quantity': 30}]}] * 3
+        response = self.client.post('/orders/bulk/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.content)
+        self.assertEqual(self.stock()['Widget'], 10)
+
+        response = self.client.post('/orders/bulk/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_reserves_across_more_products_than_sqlite_nests_expressions(self):
+        products = Product.objects.bulk_create(
+            Product(name=f'Part {index}', description='', price='1.00', stock=2) for index in range(1200)
+        )
+        adjust_stock({product.pk: 1 for product in products})
+        self.assertEqual(set(Product.objects.filter(name__startswith='Part').values_list('stock', flat=True)), {1})
+        with self.assertRaises(InsufficientStock):
+            adjust_stock({product.pk: 2 for product in products})
+
+
+class ConcurrentStockTestCase(TransactionTestCase):
+    """Real threads and connections, so the conditional UPDATE is what arbitrates."""
+
+    def test_last_units_are_sold_exactly_once(self):
+        product = Product.objects.create(name='Widget', description='', price='2.50', stock=5)
+        barrier = threading.Barrier(12)
+        outcomes = []
+
+        def checkout():
+            try:
+                barrier.wait()
+                for attempt in range(50):
+                    try:
+                        with transaction.atomic():
+                            adjust_stock({product.pk: 1})
+                        outcomes.append('sold')
+                        return
+                    except InsufficientStock:
+                        outcomes.append('sold out')
+                        return
+                    except OperationalError:  # SQLite's writer lock; PostgreSQL just waits
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ['sold'] * 5 + ['sold out'] * 7)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+
+
+class RevenueRollupTestCase(OrderApiTestCase):
+    def assertRollupMatchesRebuild(self):
+        incremental = list(MonthlyRevenue.objects.order_by('month').values_list(
+            'month', 'revenue', 'quantity', 'order_count'
+        ))
+        rebuild_monthly_revenue()
+        rebuilt = list(MonthlyRevenue.objects.order_by('month').values_list(
+            'month', 'revenue', 'quantity', 'order_count'
+        ))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_rollup_follows_order_writes(self):
+        order = self.create_order()
+        self.create_order()
+        row = MonthlyRevenue.objects.get()
+        self.assertEqual((row.revenue, row.quantity, row.order_count), (Decimal('18.00'), 6, 2))
+
+        self.client.put(f'/orders/{order.order_id}/', {
+            'customer': self.customer.pk,
+            'status': Order.StatusChoices.PENDING,
+            'item': [{'product': self.product.pk, 'quantity': 1}],
+        }, content_type='application/json')
+        self.assertRollupMatchesRebuild()
+
+        self.client.delete(f'/orders/{order.order_id}/')
+        row = MonthlyRevenue.objects.get()
+        self.assertEqual((row.revenue, row.quantity, row.order_count), (Decimal('9.00'), 3, 1))
+        self.assertRollupMatchesRebuild()
+
+    def test_deleting_a_product_takes_its_items_out_of_the_totals(self):
+        order = self.create_order()
+        response = self.client.delete(f'/products/{self.other_product.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        order.refresh_from_db()
+        self.assertEqual((order.total_price, order.total_quantity), (Decimal('5.00'), 2))
+        row = MonthlyRevenue.objects.get()
+        self.assertEqual((row.revenue, row.quantity, row.order_count), (Decimal('5.00'), 2, 1))
+        self.assertRollupMatchesRebuild()
 
-        assert response.status_code == status.HTTP_200_OK
-        orders = response.json()
-        self.assertTrue(all(order['user'] == user.id for order in orders))
+    def test_rebuild_splits_months(self):
+        order = self.create_order()
+        self.create_order()
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=62))
+        call_command('rebuild_rollups', stdout=StringIO())
 
-    def test_user_order_list_unauthenticated(self):
-        response = self.client.get(reverse('user-orders'))
+        response = self.client.get('/orders/monthly-revenue/')
+        self.assertEqual([entry['value'] for entry in response.json()], [9.0, 9.0])
+
+    def test_revenue_endpoints_read_the_rollup(self):
+        self.create_order()
+        month = timezone.localtime().month
+        self.client.logout()
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/orders/monthly-revenue/')
+        self.assertEqual(response.json()[0]['value'], 9.0)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/orders/month-revenue/', {'month': month})
+        self.assertEqual(response.json(), {'total_revenue': 9.0})
+
+        response = self.client.get('/orders/month-revenue/', {'month': month % 12 + 1})
+        self.assertEqual(response.json(), {'total_revenue': 0})
+
+
+class TopSellingTestCase(OrderApiTestCase):
+    def leaderboard(self, **params):
+        response = self.client.get('/orders/top-selling/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return [(row['name'], row['total_sold']) for row in response.json()]
+
+    def test_leaderboard_follows_item_writes(self):
+        order = self.create_order()
+        self.create_order()
+        Product.objects.create(name='Unsold', description='', price='1.00')
+        self.assertEqual(self.leaderboard(), [('Widget', 4), ('Gadget', 2)])
+
+        widget_item = order.item.get(product=self.product)
+        response = self.client.patch(f'/orders/{order.order_id}/', {
+            'item': [{'id': widget_item.pk, 'product': self.other_product.pk, 'quantity': 5}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        self.assertEqual(self.leaderboard(), [('Gadget', 6), ('Widget', 2)])
+
+        self.client.delete(f'/orders/{order.order_id}/')
+        self.assertEqual(self.leaderboard(), [('Widget', 2), ('Gadget', 1)])
+
+        incremental = sorted(ProductSales.objects.values_list('product', 'total_sold'))
+        rebuild_product_sales()
+        self.assertEqual(incremental, sorted(ProductSales.objects.values_list('product', 'total_sold')))
+
+    def test_deleting_a_sold_product_drops_its_counters(self):
+        self.create_order()
+        self.create_order()
+        response = self.client.delete(f'/products/{self.other_product.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        connection.check_constraints()
+
+        self.assertEqual(self.leaderboard(), [('Widget', 4)])
+        self.assertEqual(list(ProductSales.objects.values_list('product', 'total_sold')), [(self.product.pk, 4)])
+
+    def test_windowed_leaderboard(self):
+        old_order = self.create_order()
+        self.create_order()
+        Order.objects.filter(pk=old_order.pk).update(created_at=timezone.now() - timedelta(days=20))
+        rebuild_product_sales()
+
+        self.assertEqual(self.leaderboard(days=7), [('Widget', 2), ('Gadget', 1)])
+        self.assertEqual(self.leaderboard(days=30), [('Widget', 4), ('Gadget', 2)])
+
+        response = self.client.get('/orders/top-selling/', {'days': 3})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_leaderboard_query_count(self):
+        self.create_order()
+        self.client.logout()
+        with self.assertNumQueries(2):
+            self.client.get('/orders/top-selling/')
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class ProductListCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Widget', description='', price='2.50', stock=3, active=True)
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get('/products/', {'active': 'true', 'ordering': 'name'})
+        with self.assertNumQueries(1):  # the validators' newest-write lookup
+            second = self.client.get('/products/', {'ordering': 'name', 'active': 'true', 'utm': 'x'})
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(product_cache.stats()['hits'], 1)
+        self.assertEqual(product_cache.stats()['misses'], 1)
+
+    def test_different_parameters_do_not_share_entries(self):
+        self.client.get('/products/', {'stock__lt': 5})
+        response = self.client.get('/products/', {'stock__lt': 1})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_product_writes_invalidate_every_entry(self):
+        self.client.get('/products/')
+        self.client.get('/products/', {'search': 'Wid'})
+
+        self.product.name = 'Sprocket'
+        self.product.save()
+        response = self.client.get('/products/', {'search': 'Wid'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 0)
+
+        self.product.delete()
+        response = self.client.get('/products/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_stats_endpoint_requires_staff(self):
+        self.assertEqual(self.client.get('/cache/stats/').status_code, status.HTTP_401_UNAUTHORIZED)
+        staff = User.objects.create_superuser('admin@example.com', 'Admin', 'User', '5550000002', password='test')
+        self.client.force_login(staff)
+        response = self.client.get('/cache/stats/')
+        self.assertEqual(set(response.json()['products']), {'version', 'hits', 'stale', 'misses', 'hit_ratio'})
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class ProductInfoTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        Product.objects.create(name='Widget', description='', price='2.50', stock=4)
+        Product.objects.create(name='Gadget', description='', price='4.00', stock=10)
+        Product.objects.create(name='Sprocket', description='', price='1.50', stock=0)
+
+    def test_statistics_come_from_one_query_and_are_cached(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/products/info/')
+        self.assertEqual(response.json(), {
+            'count': 3, 'max_price': 4.0, 'min_price': 1.5, 'avg_price': 2.67,
+            'stock_value': 50.0, 'low_stock_count': 2,
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/products/info/')['X-Cache'], 'HIT')
+
+        Product.objects.create(name='Cog', description='', price='9.00', stock=1)
+        response = self.client.get('/products/info/')
+        self.assertEqual((response['X-Cache'], response.json()['count']), ('MISS', 4))
+
+    def test_products_are_only_embedded_on_request_and_paginated(self):
+        products = self.client.get('/products/info/', {'embed': 'products'}).json()['products']
+        self.assertEqual(products['count'], 3)
+        self.assertEqual([product['name'] for product in products['results']], ['Widget', 'Gadget', 'Sprocket'])
+
+        response = self.client.get('/products/info/', {'embed': 'products', 'paginate': 'cursor', 'page_size': 2})
+        products = response.json()['products']
+        self.assertEqual(len(products['results']), 2)
+        self.assertIsNotNone(products['next'])
+
+    def test_empty_catalogue(self):
+        Product.objects.all().delete()
+        self.assertEqual(self.client.get('/products/info/').json()['max_price'], None)
+
+    def test_whole_catalogue_is_streamed(self):
+        response = self.client.get('/products/info/', {'embed': 'all'})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['products'], ProductSerializer(Product.objects.order_by('pk'), many=True).data)
+
+        with override_settings(FAST_SERIALIZERS=True):
+            response = self.client.get('/products/info/', {'embed': 'all'})
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), data)
+
+
+
+class OrderListCacheTestCase(OrderApiTestCase):
+    def test_cache_is_per_user(self):
+        self.create_order()
+        self.assertEqual(self.client.get('/orders/', {'view': 'count'})['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/orders/', {'view': 'count'})['X-Cache'], 'HIT')
+
+        other = User.objects.create_user('other@example.com', 'Other', 'User', '5550000003', password='test')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get('/orders/', {'view': 'count'})['X-Cache'], 'MISS')
+
+    def test_writes_retire_cached_listings(self):
+        self.create_order()
+        self.assertEqual(self.client.get('/orders/', {'view': 'count'}).json(), {'count': 1})
+
+        order = self.create_order()
+        response = self.client.get('/orders/', {'view': 'count'})
+        self.assertEqual((response['X-Cache'], response.json()), ('MISS', {'count': 2}))
+
+        self.client.get('/orders/', {'view': 'summary'})
+        self.customer.name = 'Renamed'
+        self.customer.save()
+        response = self.client.get('/orders/', {'view': 'summary'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['customer']['name'], 'Renamed')
+
+        self.client.delete(f'/orders/{order.order_id}/')
+        self.assertEqual(self.client.get('/orders/', {'view': 'count'}).json(), {'count': 1})
+
+    def test_stale_entry_is_served_while_another_request_refreshes(self):
+        self.create_order()
+        self.client.get('/orders/', {'recent': 'true'})
+        self.create_order()
+
+        # Simulate a concurrent request that already holds the refresh lock.
+        view_key = order_cache.make_key(
+            'list', {'recent': ['true']}, 'http://testserver/', timezone.get_current_timezone_name(), self.user.pk
+        )
+        cache.add(f'{view_key}:refresh', 1, 30)
+        with self.assertNumQueries(3):  # session + user lookups and the validators' newest-write lookup
+            response = self.client.get('/orders/', {'recent': 'true'})
+        self.assertEqual((response['X-Cache'], response.json()['count']), ('STALE', 1))
+
+        cache.delete(f'{view_key}:refresh')
+        response = self.client.get('/orders/', {'recent': 'true'})
+        self.assertEqual((response['X-Cache'], response.json()['count']), ('MISS', 2))
+        self.assertEqual(self.client.get('/orders/', {'recent': 'true'})['X-Cache'], 'HIT')
+
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class ProductBulkTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bulk@example.com', 'Bulk', 'User', '5550000006', password='test')
+        self.client.force_login(self.user)
+        self.widget = Product.objects.create(name='Widget', description='Small', price='2.50', stock=3)
+
+    def test_csv_import_creates_updates_and_reports_bad_rows(self):
+        body = (
+            'id,name,description,price,stock,active\n'
+            f'{self.widget.pk},,,3.00,10,\n'
+            ',Gadget,Shiny,4.00,5,true\n'
+            ',Broken,Bad price,-1,1,\n'
+            '999999,Ghost,,1.00,1,\n'
+        )
+        self.client.get('/products/')
+        with patch('api.bulk.CHUNK_SIZE', 2):
+            response = self.client.post('/products/bulk/', body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.json()
+        self.assertEqual((result['created'], result['updated']), (1, 1))
+        self.assertEqual([error['row'] for error in result['errors']], [3, 4])
+        self.assertIn('price', result['errors'][0]['errors'])
+        self.widget.refresh_from_db()
+        self.assertEqual((self.widget.name, self.widget.price, self.widget.stock), ('Widget', Decimal('3.00'), 10))
+        self.assertTrue(Product.objects.get(name='Gadget').active)
+        self.assertEqual(self.client.get('/products/')['X-Cache'], 'MISS')
+
+    def test_ndjson_import_writes_in_batched_queries(self):
+        body = ''.join(
+            json.dumps({'name': f'Part {i}', 'description': 'Bulk', 'price': '1.00', 'stock': i}) + '\n'
+            for i in range(50)
+        ) + '\nnot json\n'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/products/bulk/', body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.json()['created'], 50)
+        self.assertEqual(response.json()['errors'][0]['row'], 51)
+        self.assertLess(len(queries), 10)
+        self.assertEqual(Product.objects.filter(description='Bulk').count(), 50)
+
+    def test_import_rejects_other_content_types_and_anonymous_users(self):
+        response = self.client.post('/products/bulk/', {'name': 'x'}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.client.logout()
+        response = self.client.post('/products/bulk/', 'name\nx\n', content_type='text/csv')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_streams_filtered_products_in_either_format(self):
+        Product.objects.create(name='Gadget', description='Shiny', price='4.00', stock=0)
+
+        response = self.client.get('/products/export/', {'stock__gt': 0})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['id,name,description,price,stock,active', f'{self.widget.pk},Widget,Small,2.50,3,False'])
+
+        response = self.client.get('/products/export/', {'type': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Widget', 'Gadget'])
+        self.assertEqual(rows[0]['price'], '2.50')
+
+
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class DashboardTestCase(OrderApiTestCase):
+    def test_one_payload_replaces_the_dashboard_requests(self):
+        self.create_order()
+        Product.objects.create(name='Sprocket', description='', price='1.00', stock=2, active=True)
+
+        with self.assertNumQueries(2 + 7):  # session and user, then the dashboard itself
+            response = self.client.get('/dashboard/')
+        data = response.json()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((data['orders_this_month'], data['revenue_this_month']), (1, 9.0))
+        self.assertEqual((data['active_products'], data['total_customers'], data['low_stock_count']), (1, 1, 1))
+        self.assertEqual([product['name'] for product in data['low_stock']], ['Sprocket'])
+        self.assertEqual([product['total_sold'] for product in data['top_selling']], [2, 1])
+        self.assertEqual(len(data['recent_orders']), 1)
+        self.assertEqual([point['value'] for point in data['monthly_revenue']], [9.0])
+
+    def test_etag_revalidation_skips_the_database_until_a_write(self):
+        etag = self.client.get('/dashboard/')['ETag']
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.create_order()
+        response = self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['orders_this_month'], 1)
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/dashboard/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+
+class AsyncReadPathTestCase(OrderApiTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(6):
+            Product.objects.create(name=f'Part {index}', description='', price=f'{index}.00', stock=index)
+        for _ in range(3):
+            self.create_order()
+
+    def assertSameAsSync(self, path, params=None):
+        sync_response = self.client.get(path, params)
+        async_response = self.client.get(f'/async{path}', params)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        expected = json.loads(json.dumps(sync_response.json()).replace('testserver/', 'testserver/async/'))
+        actual = async_response.json()
+        if path == '/orders/' and 'results' in actual:
+            # The sync list is unordered; the async one pages newest first.
+            self.assertEqual(sorted(actual.pop('results'), key=lambda order: order['order_id']),
+                             sorted(expected.pop('results'), key=lambda order: order['order_id']))
+        self.assertEqual(actual, expected)
+        return async_response
+
+    def test_products_match_the_sync_views(self):
+        self.assertSameAsSync('/products/')
+        self.assertSameAsSync('/products/', {'ordering': '-price,name', 'page': 2, 'stock__lt': 5})
+        self.assertSameAsSync('/products/', {'search': 'part'})
+        self.assertSameAsSync('/products/', {'page': 9})
+        self.assertSameAsSync('/products/', {'price__gt': 'cheap'})
+        self.assertSameAsSync(f'/products/{self.product.pk}/')
+        self.assertSameAsSync('/products/0/')
+
+    def test_orders_match_the_sync_views(self):
+        for view in ('full', 'summary', 'count'):
+            self.assertSameAsSync('/orders/', {'view': view})
+        page = self.client.get('/async/orders/', {'limit': 1, 'offset': 1}).json()
+        self.assertEqual([page['count'], len(page['results'])], [3, 1])
+        self.assertEqual(page['results'][0]['order_id'], str(Order.objects.order_by('-created_at')[1].pk))
+        self.assertEqual(page['next'], 'http://testserver/async/orders/?limit=1&offset=2')
+        self.assertSameAsSync('/orders/', {'status': 'Pending', 'recent': 'true'})
+        self.assertSameAsSync('/orders/', {'view': 'everything'})
+        self.assertEqual(self.client.get('/async/orders/', {'paginate': 'cursor'}).status_code, 400)
+
+    def test_dashboard_matches_the_sync_view(self):
+        with self.assertNumQueries(2 + 7):  # session and user, then the gathered dashboard queries
+            response = self.client.get('/async/dashboard/')
+        self.assertEqual(response.json(), self.client.get('/dashboard/').json())
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/async/dashboard/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.logout()
+        self.assertEqual(self.client.get('/async/dashboard/').status_code, status.HTTP_401_UNAUTHORIZED)
+        token = self.client.post('/api/token/', {'email': 'clerk@example.com', 'password': 'test'}).json()['access']
+        self.assertEqual(self.client.get('/async/dashboard/', HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 200)
+
+    def test_revalidation_is_a_304_until_a_write(self):
+        etag = self.client.get('/async/products/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/async/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        Product.objects.create(name='Sprocket', description='', price='1.00')
+        self.assertEqual(self.client.get('/async/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CompiledSerializerTestCase(OrderApiTestCase):
+    def setUp(self):
+        super().setUp()
+        Product.objects.create(name='Odd', description='Long\ndescription', price='1234567.05', stock=0, active=True)
+        self.create_order()
+        self.create_order()
+        other = Customer.objects.create(name='Zenith', email='zenith@example.com', phone_number='555', created_by=self.user)
+        self.client.post('/orders/', {
+            'customer': other.pk, 'status': 'CO', 'item': [{'product': self.other_product.pk, 'quantity': 3}],
+        }, content_type='application/json')
+        self.client.post('/orders/', {'item': [{'product': self.product.pk, 'quantity': 1}]}, content_type='application/json')
+        Customer.objects.create(name='No Orders', email='none@example.com', created_by=self.user)
+
+    def assertRendersLikeDRF(self, serializer_class, queryset, eager=None):
+        expected = serializer_class((eager or (lambda qs: qs))(queryset), many=True).data
+        compiled = CompiledSerializer(serializer_class)
+        actual = compiled.render(compiled.values(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_output_is_byte_identical(self):
+        for zone in ('UTC', 'Asia/Kolkata'):
+            with self.subTest(zone=zone), timezone.override(zone):
+                self.assertRendersLikeDRF(ProductSerializer, Product.objects.order_by('pk'))
+                self.assertRendersLikeDRF(OrderSummarySerializer, Order.objects.order_by('created_at'))
+                self.assertRendersLikeDRF(
+                    OrderSerializer, Order.objects.order_by('created_at'), OrderSerializer.setup_eager_loading
+                )
+                self.assertRendersLikeDRF(
+                    CustomerSerializer, Customer.objects.order_by('pk'), CustomerSerializer.setup_eager_loading
+                )
+
+    def test_fetches_each_relation_once_per_page(self):
+        compiled = CompiledSerializer(OrderSerializer)
+        with self.assertNumQueries(5):  # orders, items, product ids, customer histories, their items
+            compiled.render(compiled.values(Order.objects.all()))
+
+    @override_settings(FAST_SERIALIZERS=True)
+    def test_list_endpoints_use_it_when_enabled(self):
+        for path, params in [
+            ('/products/', {'ordering': '-price'}),
+            ('/products/', {'paginate': 'cursor', 'page_size': 2}),
+            ('/orders/', {'view': 'summary', 'paginate': 'cursor'}),
+            ('/orders/', {'status': 'CO'}),
+            ('/customers/', {}),
+        ]:
+            with self.subTest(path=path, params=params):
+                cache.clear()
+                with override_settings(FAST_SERIALIZERS=False):
+                    expected = self.client.get(path, params).content
+                cache.clear()
+                with patch.object(CompiledSerializer, 'render', autospec=True, side_effect=CompiledSerializer.render) as render:
+                    self.assertEqual(self.client.get(path, params).content, expected)
+                render.assert_called()
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class ConditionalGetTestCase(OrderApiTestCase):
+    def revalidate(self, path, response, **params):
+        return self.client.get(path, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_products_revalidate_with_one_query(self):
+        self.client.logout()
+        Product.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        listing = self.client.get('/products/', {'ordering': 'name'})
+        detail = self.client.get(f'/products/{self.product.pk}/')
+        self.assertEqual(listing['Cache-Control'], 'no-cache')
+        self.assertIn('Last-Modified', listing)
+
+        with self.assertNumQueries(3):  # the newest-write lookup for each
+            self.assertEqual(self.revalidate('/products/', listing, ordering='name').status_code, 304)
+            self.assertEqual(self.revalidate(f'/products/{self.product.pk}/', detail).status_code, 304)
+            self.assertEqual(
+                self.client.get('/products/', {'ordering': 'name'},
+                                HTTP_IF_MODIFIED_SINCE=listing['Last-Modified']).status_code,
+                304,
+            )
+        self.assertEqual(self.revalidate('/products/', listing, ordering='price').status_code, 200)
+
+        self.product.stock = 5
+        self.product.save()
+        response = self.revalidate(f'/products/{self.product.pk}/', detail)
+        self.assertEqual((response.status_code, response.json()['stock']), (200, 5))
+
+    def test_validators_follow_writes_that_bypass_this_process(self):
+        # A bulk UPDATE sends no signals, so no cache version moves: as when another worker writes.
+        detail = self.client.get(f'/products/{self.product.pk}/')
+        Product.objects.filter(pk=self.product.pk).update(stock=9, updated_at=timezone.now())
+        response = self.revalidate(f'/products/{self.product.pk}/', detail)
+        self.assertEqual((response.status_code, response.json()['stock']), (200, 9))
+
+        # Deleting a row that was not the newest write leaves MAX(updated_at) alone; its tombstone does not.
+        older = Product.objects.create(name='Sprocket', description='', price='1.00')
+        Product.objects.filter(pk=older.pk).update(updated_at=timezone.now() - timedelta(minutes=1))
+        listing = self.client.get('/products/')
+        older.delete()
+        self.assertEqual(self.revalidate('/products/', listing).status_code, 200)
+
+    def test_last_modified_waits_for_the_second_of_the_last_write(self):
+        written = datetime(2026, 1, 1, 12, 0, 0, 500000, tzinfo=dt_timezone.utc)
+        Product.objects.update(updated_at=written)
+        with patch('api.cache.time.time', return_value=written.timestamp() + 0.2):
+            self.assertNotIn('Last-Modified', self.client.get('/products/'))
+        with patch('api.cache.time.time', return_value=written.timestamp() + 0.5):
+            listing = self.client.get('/products/')
+        self.assertEqual(listing['Last-Modified'], 'Thu, 01 Jan 2026 12:00:01 GMT')
+        modified_since = {'HTTP_IF_MODIFIED_SINCE': listing['Last-Modified']}
+        self.assertEqual(self.client.get('/products/', **modified_since).status_code, 304)
+
+        # A write at the very start of the next second is still newer than that header.
+        Product.objects.update(updated_at=written + timedelta(milliseconds=500))
+        self.assertEqual(self.client.get('/products/', **modified_since).status_code, 200)
+
+    def test_order_and_customer_validators_follow_order_writes(self):
+        listing = self.client.get('/orders/')
+        customer = self.client.get(f'/customers/{self.customer.pk}/')
+        self.assertEqual(self.revalidate('/orders/', listing).status_code, 304)
+        self.assertEqual(self.revalidate(f'/customers/{self.customer.pk}/', customer).status_code, 304)
+
+        order = self.create_order()
+        self.assertEqual(self.revalidate('/orders/', listing).status_code, 200)
+        response = self.revalidate(f'/customers/{self.customer.pk}/', customer)
+        self.assertEqual(response.status_code, 200)
+        detail = self.client.get(f'/orders/{order.order_id}/')
+        self.assertEqual(self.revalidate(f'/orders/{order.order_id}/', detail).status_code, 304)
+
+    def test_order_validators_are_per_user(self):
+        listing = self.client.get('/orders/')
+        other = User.objects.create_user('other@example.com', 'Other', 'User', '5550000007', password='test')
+        self.client.force_login(other)
+        self.assertEqual(self.revalidate('/orders/', listing).status_code, 200)
+
+
+
+class DeltaSyncTestCase(OrderApiTestCase):
+    def sync(self, **params):
+        response = self.client.get('/sync/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        return lines[:-1], lines[-1]['cursor']
+
+    def changed(self, lines):
+        return {(line['table'], line['op'], str(line.get('id') or line['row'].get('id') or line['row'].get('order_id')))
+                for line in lines}
+
+    def test_full_then_incremental_sync(self):
+        order = self.create_order()
+        lines, cursor = self.sync()
+        self.assertEqual(
+            [line['table'] for line in lines],
+            ['products', 'products', 'customers', 'orders', 'order_items', 'order_items'],
+        )
+        self.assertEqual(lines[3]['row']['total_price'], '9.00')
+
+        # Age everything, then touch one product through an .update() path and delete another.
+        long_ago = timezone.now() - timedelta(days=1)
+        for model in (Product, Customer, Order, OrderItem):
+            model.objects.update(updated_at=long_ago)
+        since = timezone.now() - timedelta(minutes=1)
+        self.client.patch(f'/orders/{order.order_id}/', {'status': Order.StatusChoices.CANCELLED},
+                          content_type='application/json')
+        doomed = Product.objects.create(name='Doomed', description='', price='1.00')
+        Product.objects.filter(pk=doomed.pk).delete()
+
+        lines, _ = self.sync(since=encode_token(since))
+        self.assertEqual(self.changed(lines), {
+            ('products', 'upsert', str(self.product.pk)),  # stock put back by the cancellation
+            ('products', 'upsert', str(self.other_product.pk)),
+            ('products', 'delete', str(doomed.pk)),
+            ('orders', 'upsert', str(order.order_id)),
+        })
+        self.assertTrue(cursor.isdigit())
+
+    def test_tables_can_be_narrowed(self):
+        self.create_order()
+        lines, _ = self.sync(tables='orders,customers')
+        self.assertEqual({line['table'] for line in lines}, {'customers', 'orders'})
+
+    def test_rejects_bad_tokens_tables_and_anonymous_clients(self):
+        expired = encode_token(timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1))
+        self.assertEqual(self.client.get('/sync/', {'since': expired}).status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.client.get('/sync/', {'since': 'yesterday'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/sync/', {'tables': 'users'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.logout()
+        self.assertEqual(self.client.get('/sync/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_tombstones(self):
+        Product.objects.all().delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1))
+        call_command('prune_tombstones', stdout=StringIO())
+        self.assertFalse(Tombstone.objects.exists())
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class OrderBulkCreateTestCase(OrderApiTestCase):
+    def batch(self, size):
+        return [
+            {
+                'customer': self.customer.pk if i % 2 else None,
+                'item': [
+                    {'product': self.product.pk, 'quantity': 2},
+                    {'product': self.other_product.pk, 'quantity': 1},
+                ],
+            }
+            for i in range(size)
+        ]
+
+    def post_batch(self, payload):
+        return self.client.post('/orders/bulk/', payload, content_type='application/json')
+
+    def test_batch_is_inserted_with_totals_snapshots_and_rollups(self):
+        self.client.get('/orders/')
+        response = self.post_batch(self.batch(3))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.content)
+        self.assertEqual([row['total_price'] for row in response.json()], [9.0, 9.0, 9.0])
+        orders = Order.objects.filter(created_by=self.user)
+        self.assertEqual(orders.count(), 3)
+        self.assertEqual(orders.filter(customer=self.customer).count(), 1)
+        self.assertEqual(set(OrderItem.objects.values_list('unit_price', flat=True)), {Decimal('2.50'), Decimal('4.00')})
+
+        month = MonthlyRevenue.objects.get()
+        self.assertEqual((month.revenue, month.quantity, month.order_count), (Decimal('27.00'), 9, 3))
+        self.assertEqual(ProductSales.objects.get(product=self.product).total_sold, 6)
+        self.assertEqual(self.client.get('/orders/')['X-Cache'], 'MISS')
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        self.post_batch(self.batch(1))  # creates the rollup rows the later batches update
+        with CaptureQueriesContext(connection) as small:
+            self.post_batch(self.batch(2))
+        with CaptureQueriesContext(connection) as large:
+            self.post_batch(self.batch(40))
+        self.assertEqual(len(large), len(small))
+
+    def test_query_count_does_not_grow_with_the_products(self):
+        parts = Product.objects.bulk_create(
+            Product(name=f'Part {index}', description='', price='1.00', stock=10) for index in range(50)
+        )
+
+        def batch(products):
+            return [{'customer': None, 'item': [{'product': product.pk, 'quantity': 1} for product in products]}]
+
+        self.post_batch(self.batch(1))  # creates this month's revenue row
+        # session + user, prices, stock, orders, items, revenue (2), counter rows (2), counters (2), savepoints
+        with self.assertNumQueries(16):
+            self.post_batch(batch(parts[:1]))
+        with self.assertNumQueries(16):
+            self.post_batch(batch(parts))
+        self.assertEqual(
+            dict(ProductSales.objects.filter(product__in=parts[:2]).values_list('product', 'total_sold')),
+            {parts[0].pk: 2, parts[1].pk: 1},
+        )
+        self.assertEqual(DailyProductSales.objects.filter(product__in=parts).aggregate(Sum('quantity'))['quantity__sum'], 51)
+
+    def test_unknown_ids_reject_the_whole_batch(self):
+        payload = self.batch(2)
+        payload[1]['item'][1]['product'] = 999999
+        payload[1]['customer'] = 999999
+
+        response = self.post_batch(payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()[0], {})
+        self.assertEqual(set(response.json()[1]), {'customer', 'item'})
+        self.assertEqual(response.json()[1]['item'][0], {})
+        self.assertFalse(Order.objects.exists())
+
+    def test_requires_authentication_and_valid_quantities(self):
+        payload = self.batch(1)
+        payload[0]['item'][0]['quantity'] = 0
+        self.assertEqual(self.post_batch(payload).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.logout()
+        self.assertEqual(self.post_batch(self.batch(1)).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class SearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        for name in ('Blue Widget', 'Widget Pro', 'Widget', 'Gadget'):
+            Product.objects.create(name=name, description='', price='1.00')
+        self.user = User.objects.create_user('search@example.com', 'Search', 'User', '5550000008', password='test')
+        Customer.objects.create(name='Acme Retail', email='acme@example.com', created_by=self.user)
+        Customer.objects.create(name='Zenith Traders', email='zenith@example.com', created_by=self.user)
+
+    def names(self, response):
+        rows = response.json()
+        return [row['name'] for row in (rows['results'] if isinstance(rows, dict) else rows)]
+
+    def test_list_search_matches_substrings_and_ids(self):
+        self.assertEqual(set(self.names(self.client.get('/products/', {'search': 'wid'}))),
+                         {'Blue Widget', 'Widget Pro', 'Widget'})
+        self.assertEqual(set(self.names(self.client.get('/products/', {'search': 'dget'}))),
+                         {'Blue Widget', 'Widget Pro', 'Widget', 'Gadget'})
+        self.assertEqual(self.names(self.client.get('/products/', {'search': 'widg pro'})), ['Widget Pro'])
+        self.assertEqual(self.names(self.client.get('/products/', {'search': 'ue,wid'})), ['Blue Widget'])
+        self.assertEqual(self.names(self.client.get('/customers/', {'search': 'ader'})), ['Zenith Traders'])
+
+    def test_list_search_matches_id_substrings(self):
+        Product.objects.create(id=987654, name='Gizmo', description='', price='1.00')
+        self.assertEqual(self.names(self.client.get('/products/', {'search': '987654'})), ['Gizmo'])
+        self.assertEqual(self.names(self.client.get('/products/', {'search': '8765'})), ['Gizmo'])
+        self.assertEqual(self.names(self.client.get('/products/', {'search': 'giz 8765'})), ['Gizmo'])
+        self.assertEqual(self.names(self.client.get('/products/', {'search': 'wid 8765'})), [])
+
+    def test_index_follows_renames_and_deletes(self):
+        Product.objects.filter(name='Gadget').update(name='Gizmo')
+        Product.objects.filter(name='Widget Pro').delete()
+        self.assertEqual(self.names(self.client.get('/products/autocomplete/', {'q': 'giz'})), ['Gizmo'])
+        self.assertEqual(self.names(self.client.get('/products/autocomplete/', {'q': 'gad'})), [])
+        self.assertNotIn('Widget Pro', self.names(self.client.get('/products/autocomplete/', {'q': 'widget'})))
+
+    def test_autocomplete_ranks_caps_and_caches(self):
+        response = self.client.get('/products/autocomplete/', {'q': 'Widget'})
+        names = self.names(response)
+        self.assertEqual(names[0], 'Widget')
+        self.assertEqual(set(names), {'Blue Widget', 'Widget Pro', 'Widget'})
+        self.assertEqual(set(response.json()[0]), {'id', 'name', 'price'})
+        self.assertEqual(len(self.names(self.client.get('/products/autocomplete/', {'q': 'wid', 'limit': 2}))), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/products/autocomplete/', {'q': 'widget '})['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/products/autocomplete/', {'q': 'wid', 'limit': 500}).status_code, 400)
+        self.assertEqual(self.client.get('/products/autocomplete/', {'q': '!!'}).json(), [])
+
+    def test_fallback_ranking_without_fts(self):
+        with patch.object(product_search, 'uses_fts', return_value=False):
+            self.assertEqual([p.name for p in product_search.autocomplete('widget')],
+                             ['Widget', 'Widget Pro', 'Blue Widget'])
+            self.assertEqual([p.name for p in product_search.autocomplete('wi')], ['Widget', 'Widget Pro'])
+            self.assertEqual(product_search.filter(Product.objects.all(), 'blue wid').get().name, 'Blue Widget')
+
+    def test_customer_autocomplete_leaves_out_order_history(self):
+        response = self.client.get('/customers/autocomplete/', {'q': 'acm'})
+        self.assertEqual(response.json(), [{
+            'id': Customer.objects.get(name='Acme Retail').pk, 'name': 'Acme Retail',
+            'email': 'acme@example.com', 'phone_number': None,
+        }])
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE, PRODUCT_NAME_INDEX=True, PRODUCT_NAME_INDEX_RECHECK=3600)
+class ProductNameIndexTestCase(TestCase):
+    def setUp(self):
+        product_names.reset()
+        self.addCleanup(product_names.reset)
+        for name in ('Blue Widget', 'Widget Pro', 'Widget', 'Gadget'):
+            Product.objects.create(name=name, description='', price='1.00', active=True)
+        Product.objects.create(name='Widget Mk I', description='', price='1.00', active=False)
+        product_names.build()
+
+    def names(self, text, limit=10):
+        return [row['name'] for row in product_names.search(text, limit)]
+
+    def test_searches_prefixes_and_ids_without_queries(self):
+        gadget = Product.objects.get(name='Gadget')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('widget'), ['Widget', 'Widget Pro', 'Blue Widget'])
+            self.assertEqual(self.names('blue wid'), ['Blue Widget'])
+            self.assertEqual(self.names('pro'), ['Widget Pro'])
+            self.assertEqual(self.names('WID', limit=2), ['Widget', 'Widget Pro'])
+            self.assertEqual(self.names(str(gadget.pk)), ['Gadget'])
+            self.assertEqual(self.names('mk'), [])
+            response = self.client.get('/products/autocomplete/', {'q': 'gad'})
+        self.assertEqual(response.json(), [ProductOptionSerializer(gadget).data])
+
+    def test_signals_apply_this_workers_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Gizmo', description='', price='2.00', active=True)
+            widget = Product.objects.get(name='Widget Pro')
+            widget.active = False
+            widget.save()
+            Product.objects.get(name='Gadget').delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('gizmo'), ['Gizmo'])
+            self.assertEqual(self.names('widget'), ['Widget', 'Blue Widget'])
+            self.assertEqual(self.names('gad'), [])
+
+    def test_refresh_catches_writes_that_sent_no_signal(self):
+        # TestCase never runs on_commit callbacks, so none of these reach the index until refresh().
+        Product.objects.filter(name='Widget').update(price='7.00', updated_at=timezone.now())
+        Product.objects.filter(name='Widget Mk I').update(active=True, updated_at=timezone.now())
+        Product.objects.filter(name='Gadget').delete()
+        product_names.checked_clock -= 3600
+        self.assertEqual(self.names('widget'), ['Widget', 'Widget Mk I', 'Widget Pro', 'Blue Widget'])
+        self.assertEqual(product_names.search('widget', 1)[0]['price'], '7.00')
+        self.assertEqual(self.names('gad'), [])
+        with self.assertNumQueries(0):
+            self.names('widget')
+
+    def test_stats_report_memory(self):
+        stats = product_names.stats()
+        self.assertEqual(stats['products'], 4)
+        self.assertEqual(stats['bytes_per_100k_products'], stats['bytes'] * 25_000)
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('pager@example.com', 'Pager', 'User', '5550000004', password='test')
+        Product.objects.bulk_create(
+            Product(name=f'Product {i}', description='', price='1.00') for i in range(12)
+        )
+        for i in range(7):
+            Order.objects.create(created_by=self.user)
+
+    def walk(self, url, **params):
+        pages, rows = [], []
+        params['paginate'] = 'cursor'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url, params).json()
+            pages.append(queries)
+            rows.extend(data['results'])
+            url, params = data['next'], {}
+        return pages, rows
+
+    def test_products_walk_by_primary_key_without_count(self):
+        pages, rows = self.walk('/products/', page_size=5)
+
+        self.assertEqual([row['id'] for row in rows], list(Product.objects.order_by('pk').values_list('pk', flat=True)))
+        self.assertEqual(len(pages), 3)
+        for queries in pages:
+            self.assertEqual(len(queries), 2)  # the validators' newest-write lookup and the page
+            self.assertNotIn('COUNT(', queries[1]['sql'])
+
+    def test_orders_walk_newest_first(self):
+        pages, rows = self.walk('/orders/', view='summary', page_size=3)
+
+        expected = Order.objects.order_by('-created_at', '-order_id').values_list('order_id', flat=True)
+        self.assertEqual([row['order_id'] for row in rows], [str(pk) for pk in expected])
+        self.assertEqual(len({len(queries) for queries in pages}), 1)
+
+    def test_page_size_is_part_of_the_cache_key(self):
+        for page_size in (5, 10):
+            data = self.client.get('/products/', {'paginate': 'cursor', 'page_size': page_size}).json()
+            self.assertEqual(len(data['results']), page_size)
+
+    def test_default_pagination_is_unchanged(self):
+        response = self.client.get('/products/', {'page': 2})
+        self.assertEqual(response.json()['count'], 12)
+        response = self.client.get('/orders/', {'limit': 2, 'offset': 2})
+        self.assertEqual((response.json()['count'], len(response.json()['results'])), (7, 2))
+
+
+class FilterIndexTestCase(TestCase):
+    def test_indexed_filters_avoid_full_scans(self):
+        out = StringIO()
+        call_command('explain_filters', '--json', '--repeat', '1', stdout=out)
+        scans = {result['filter']: result['full_scan'] for result in json.loads(out.getvalue())['results']}
+
+        for label in (
+            'products ?price__range=',
+            'products ?stock__lt=5',
+            'products ?active=true&stock__lt=5',
+            'orders ?status=',
+            'orders ?status=&created_at__gt=',
+            'orders ?recent=true',
+            'orders ?created_at=',
+            'orders ?month=',
+            'orders ?year=&month=',
+            'orders ?from=&to=',
+        ):
+            self.assertFalse(scans[label], label)
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE)
+class OrderDateFilterTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('dates@example.com', 'Date', 'User', '5550000005', password='test')
+
+    def order_at(self, when):
+        order = Order.objects.create(created_by=self.user)
+        Order.objects.filter(pk=order.pk).update(created_at=when)
+        return str(order.pk)
+
+    def filtered(self, **params):
+        response = self.client.get('/orders/', {'view': 'summary', 'limit': 100, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return {row['order_id'] for row in response.json()['results']}
+
+    def test_month_is_scoped_to_a_year(self):
+        this_year = timezone.localdate().year
+        current = self.order_at(timezone.make_aware(datetime(this_year, 1, 15, 12)))
+        last_year = self.order_at(timezone.make_aware(datetime(this_year - 1, 1, 15, 12)))
+
+        self.assertEqual(self.filtered(month=1), {current})
+        self.assertEqual(self.filtered(month=1, year=this_year - 1), {last_year})
+        self.assertEqual(self.filtered(year=this_year - 1), {last_year})
+        self.assertEqual(self.client.get('/orders/', {'month': 13}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_day_boundaries_follow_the_active_timezone(self):
+        # 20:00 UTC on 31 March is already 1 April in Kolkata.
+        order = self.order_at(datetime(2024, 3, 31, 20, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.filtered(created_at='2024-03-31'), {order})
+        with timezone.override('Asia/Kolkata'):
+            self.assertEqual(self.filtered(created_at='2024-03-31'), set())
+            self.assertEqual(self.filtered(created_at='2024-04-01'), {order})
+            self.assertEqual(self.filtered(year=2024, month=4), {order})
+
+    def test_from_to_range_is_inclusive(self):
+        first = self.order_at(timezone.make_aware(datetime(2024, 5, 1, 0, 0)))
+        last = self.order_at(timezone.make_aware(datetime(2024, 5, 31, 23, 59)))
+        self.order_at(timezone.make_aware(datetime(2024, 6, 1, 0, 0)))
+
+        self.assertEqual(self.filtered(**{'from': '2024-05-01', 'to': '2024-05-31'}), {first, last})
+        self.assertEqual(self.filtered(**{'from': '2024-05-31'}), {last} | self.filtered(**{'from': '2024-06-01'}))
+
+    def test_month_revenue_uses_the_rollup_for_year_and_month(self):
+        order = Order.objects.create(created_by=self.user, total_price=5)
+        order.created_at = timezone.make_aware(datetime(2023, 2, 10, 12))
+        Order.objects.filter(pk=order.pk).update(created_at=order.created_at)
+        rebuild_monthly_revenue()
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/orders/month-revenue/', {'month': 2, 'year': 2023})
+        self.assertEqual(response.json(), {'total_revenue': 5.0})
+        self.assertEqual(self.client.get('/orders/month-revenue/', {'month': 2}).json(), {'total_revenue': 0})
+        self.assertEqual(self.client.get('/orders/month-revenue/', {'year': 2023}).json(), {'total_revenue': 5.0})
+
+
+class FastJSONRendererTestCase(TestCase):
+    def test_output_matches_json_renderer(self):
+        product = Product.objects.create(name='Widget \u2028', description='', price='2.50', stock=4)
+        data = {
+            'product': ProductSerializer(product).data,
+            'values': [Decimal('2.50'), product.updated_at.date(), None, True, 1.5],
+            'errors': ProductFilter({'price__gt': 'cheap'}).errors,
+            'utc': datetime(2024, 1, 5, 10, 0, 0, 123, tzinfo=dt_timezone.utc),
+            'naive': datetime(2024, 1, 5, 10, 0),
+            'lazy': _('Not found.'),
+            7: 'integer key',
+        }
+        with timezone.override('Asia/Kolkata'):
+            data['local'] = timezone.localtime(product.updated_at)
+        with timezone.override('Europe/London'):
+            data['zero_offset'] = timezone.localtime(datetime(2024, 1, 5, tzinfo=dt_timezone.utc))
+        expected = JSONRenderer().render(data)
+
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with patch('api.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_streamed_output_is_the_same_document(self):
+        Product.objects.bulk_create(
+            Product(name=f'Product {n}', description='', price=n, stock=n) for n in range(1, 8)
+        )
+        rows = ProductSerializer(Product.objects.order_by('pk'), many=True).data
+        chunks = list(iter_json({'count': 7, 'products': iter(rows), 'done': True}, chunk_size=3))
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(json.loads(b''.join(chunks)), {'count': 7, 'products': rows, 'done': True})
+
+        for value, expected in ((iter([]), b'[]'), ({'products': iter([])}, b'{"products":[]}'), ({}, b'{}')):
+            with self.subTest(expected=expected):
+                self.assertEqual(b''.join(iter_json(value, chunk_size=3)), expected)
+        response = StreamingJSONResponse(Product.objects.order_by('pk').values('name'), chunk_size=3)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 7)
+
+
+class BenchmarkCommandTestCase(TestCase):
+    def test_seed_data_is_consistent(self):
+        out = StringIO()
+        call_command('seed_data', '--users=2', '--products=30', '--customers=5', '--orders=40', '--items=3',
+                     '--batch-size=7', '--json', stdout=out)
+        created = json.loads(out.getvalue())['created']
+        self.assertEqual(
+            created,
+            {'users': 2, 'products': 30, 'customers': 5, 'orders': 40, 'items': OrderItem.objects.count()},
+        )
+        self.assertEqual(User.objects.filter(is_staff=True).count(), 1)
+        for order in Order.objects.prefetch_related('item'):
+            self.assertTrue(1 <= len(order.item.all()) <= 3)
+            self.assertEqual(order.total_price, sum(line.Item_SubTotal for line in order.item.all()))
+        self.assertGreater(len({order.created_at.date() for order in Order.objects.all()}), 1)
+        self.assertEqual(MonthlyRevenue.objects.aggregate(n=Sum('order_count'))['n'], 40)
+
+    def test_benchmark_covers_every_route_and_rolls_back_writes(self):
+        call_command('seed_data', '--users=1', '--products=10', '--customers=2', '--orders=5', stdout=StringIO())
+        Product.objects.update(stock=500, active=True)
+        counts = [model.objects.count() for model in (Product, Customer, Order)]
+
+        out = StringIO()
+        call_command('benchmark_api', '--repeat=2', '--warmup=0', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['uncovered'], [])
+        self.assertEqual([result['endpoint'] for result in report['results'] if not result['ok']], [])
+        for result in report['results']:
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['bytes'], 0)
+        self.assertEqual([model.objects.count() for model in (Product, Customer, Order)], counts)
+
+        # A previous run that needed fewer queries makes --compare fail.
+        report['results'] = [dict(result, queries=0) for result in report['results'] if result['endpoint'] == 'orders']
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as previous:
+            json.dump(report, previous)
+            previous.flush()
+            with self.assertRaisesMessage(CommandError, 'orders: 0 ->'):
+                call_command('benchmark_api', '--repeat=1', '--only=orders', f'--compare={previous.name}',
+                             stdout=StringIO())
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE, QUERY_BUDGETS='raise')
+class QueryBudgetTestCase(TestCase):
+    def read_queries(self):
+        """
+        Queries per read endpoint in api.urls (benchmark_api's GET requests) on a cold cache.
+        Going over a budget raises QueryBudgetExceeded, which fails the test.
+        """
+        product = Product.objects.order_by('pk').first()
+        order = Order.objects.order_by('-created_at').first()
+        customer = Customer.objects.order_by('pk').first()
+        user = User.objects.order_by('-is_staff', 'pk').first()
+        self.client.force_login(user)
+        counts = {}
+        for label, method, path, data in endpoint_cases(product, order, customer, user):
+            if method != 'GET':
+                continue
+            self.client.get(path, data)  # once-per-process lookups, such as whether FTS tables exist
+            cache.clear()
+            response = self.client.get(path, data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, label)
+            self.assertTrue(response.has_header('X-Query-Budget'), f'{label} declares no query budget')
+            counts[label] = int(response['X-Query-Count'])
+        return counts
+
+    def test_budgets_hold_and_queries_do_not_grow_with_rows(self):
+        seed(users=1, products=1, customers=1, orders=1, items=1, days=30, rng=random.Random(0), batch_size=100)
+        one_row = self.read_queries()
+        seed(users=0, products=99, customers=99, orders=99, items=3, days=30, rng=random.Random(1), batch_size=100)
+        self.assertEqual(self.read_queries(), one_row)
+
+    def test_overruns_raise_or_warn(self):
+        Product.objects.create(name='Widget', description='', price='2.50', stock=4)
+        with patch.object(ProductInfoAPIView, 'query_budget', QueryBudget(0)):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'GET /products/info/ went over its query budget: 1'):
+                self.client.get('/products/info/')
+            with override_settings(QUERY_BUDGETS='warn'), self.assertLogs('api.budgets', 'WARNING'):
+                response = self.client.get('/products/info/', {'embed': 'products'})
+            self.assertEqual((response['X-Query-Count'], response['X-Query-Budget']), ('3', '0'))
+            # A bearer token's user lookup runs inside the view and is allowed for.
+            response = self.client.get('/products/info/', HTTP_AUTHORIZATION='Bearer not-checked-here')
+            self.assertEqual(response['X-Query-Budget'], '1')
+        with override_settings(QUERY_BUDGETS='off'):
+            self.assertFalse(self.client.get('/products/info/').has_header('X-Query-Count'))
+
+    async def test_async_views_are_measured_without_a_sync_stack(self):
+        await Product.objects.acreate(name='Widget', description='', price='2.50', stock=4)
+        response = await self.async_client.get('/async/products/')
+        self.assertEqual((response['X-Query-Count'], response['X-Query-Budget']), ('3', '3'))
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(self.async_client.handler.get_response_async)))
+
+    def test_queries_in_other_threads_are_counted(self):
+        # Each thread has its own connection, as under ASGI, where the ORM runs in sync_to_async threads.
+        def select_one():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                connection.close()
+
+        with QueryUsage().counting() as usage:
+            async_to_sync(sync_to_async(select_one, thread_sensitive=False))()
+        self.assertEqual(usage.queries, 1)
+
+
+@override_settings(MIDDLEWARE=API_MIDDLEWARE, METRICS_SAMPLE_RATE=1.0, METRICS_TOKEN='scraper-token')
+class RequestMetricsTestCase(TestCase):
+    token = 'scraper-token'
+
+    def setUp(self):
+        cache.clear()
+        request_metrics.reset()
+        Product.objects.create(name='Widget', description='', price='2.50', stock=4)
+
+    def test_sampled_requests_are_timed_and_aggregated(self):
+        for _ in range(3):
+            response = self.client.get('/products/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+        self.client.get('/products/404/')
+
+        endpoints = self.client.get('/metrics/', HTTP_X_METRICS_TOKEN=self.token).json()['endpoints']
+        products = endpoints['GET products/']
+        self.assertEqual(products['requests'], 3)
+        self.assertEqual(sum(products['histogram'].values()), 3)
+        self.assertIn(products['p99_ms'], (*LATENCY_BUCKETS_MS, products['max_ms']))
+        self.assertEqual(products['max_queries'], 3)  # validators, count and page on the first, uncached request
+        self.assertEqual(endpoints['GET products/<int:product_id>/']['errors'], 0)
+
+        self.assertEqual(self.client.delete('/metrics/', HTTP_X_METRICS_TOKEN=self.token).status_code,
+                         status.HTTP_204_NO_CONTENT)
+        self.assertNotIn('GET products/', request_metrics.snapshot()['endpoints'])
+
+    async def test_async_requests_are_timed_without_a_sync_stack(self):
+        response = await self.async_client.get('/async/products/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries", total;dur=[\d.]+$')
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(self.async_client.handler.get_response_async)))
+
+    def test_sampling_and_endpoint_limit(self):
+        with override_settings(METRICS_SAMPLE_RATE=0.0):
+            self.assertFalse(self.client.get('/products/').has_header('Server-Timing'))
+        with override_settings(METRICS_MAX_ENDPOINTS=1):
+            self.client.get('/products/')
+            self.client.get('/products/info/')
+            self.client.get('/no-such-url/')
+        self.assertEqual(
+            {endpoint: stats['requests'] for endpoint, stats in request_metrics.snapshot()['endpoints'].items()},
+            {'GET products/': 1, 'other': 2},
+        )
+
+    def test_metrics_need_staff_or_the_token(self):
+        # Behind a reverse proxy every request comes from the loopback address, so that grants nothing.
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get('/metrics/', HTTP_X_METRICS_TOKEN='wrong').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.delete('/metrics/', HTTP_X_METRICS_TOKEN=self.token).status_code,
+                         status.HTTP_204_NO_CONTENT)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics/', HTTP_X_METRICS_TOKEN='').status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+        staff = User.objects.create_user('ops@example.com', 'Ops', 'User', '5550000201', password='test')
+        User.objects.filter(pk=staff.pk).update(is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_200_OK)
+
+    def test_silk_ui_is_only_mounted_with_profiling(self):
+        import drf_course.urls
+
+        def silk_mounted():
+            importlib.reload(drf_course.urls)
+            clear_url_caches()
+            try:
+                return resolve('/silk/').namespace == 'silk'
+            except Resolver404:
+                return False
+
+        self.addCleanup(clear_url_caches)
+        self.addCleanup(importlib.reload, drf_course.urls)
+        with override_settings(SILK_PROFILING=True):
+            self.assertTrue(silk_mounted())
+        with override_settings(SILK_PROFILING=False):
+            self.assertFalse(silk_mounted())
+
+    def test_silk_only_records_staff_requests_that_ask(self):
+        staff = User.objects.create_user('ops@example.com', 'Ops', 'User', '5550000201', password='test')
+        User.objects.filter(pk=staff.pk).update(is_staff=True)
+        staff.refresh_from_db()
+        clerk = User.objects.create_user('clerk@example.com', 'Clerk', 'User', '5550000202', password='test')
+
+        def requested(user=None, bearer=None, ask=True):
+            headers = {'HTTP_X_SILK_PROFILE': '1'} if ask else {}
+            if bearer is not None:
+                headers['HTTP_AUTHORIZATION'] = f'Bearer {bearer}'
+            request = RequestFactory().get('/products/', **headers)
+            request.user = user or AnonymousUser()
+            return silk_requested(request)
+
+        self.assertTrue(requested(staff))
+        self.assertFalse(requested(clerk))
+        self.assertFalse(requested(staff, ask=False))
+        self.assertTrue(requested(bearer=AccessToken.for_user(staff)))
+        self.assertFalse(requested(bearer=AccessToken.for_user(clerk)))
+        self.assertFalse(requested(bearer='not-a-token'))
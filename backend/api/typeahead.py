@@ -0,0 +1,176 @@
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from api.models import Product, Tombstone
+from api.serializers import ProductOptionSerializer
+from api.sync import SYNC_OVERLAP, table_label
+
+_price = ProductOptionSerializer().fields['price']
+
+
+def index_keys(pk, name):
+    """
+    The folded name, then the name from each later word onwards plus the id, so "gad" and
+    "widget gad" both find "Widget Gadget".
+    """
+    folded = name.casefold()
+    starts = [match.start() for match in re.finditer(r'\w+', folded)]
+    return folded, {folded[start:] for start in starts[1:]} - {folded} | {str(pk)}
+
+
+class ProductNameIndex:
+    """
+    Active products held in this process for the order form's product picker, as two sorted
+    lists of ``(key, id)`` pairs (see index_keys): whole names, and later words and ids. A
+    lookup is a bisect into each plus a walk of at most ``limit`` entries, and never a query.
+    Each product is kept as a ``(name, price)`` tuple, the price already rendered as
+    ProductOptionSerializer renders it; the response dicts are built only for matches.
+
+    This worker's own writes arrive through signals. Everything else (other workers, and the
+    bulk UPDATEs that reserve stock or import products, which send no signals) is picked up by
+    refresh(), which re-reads rows changed since the last check, at most once every
+    PRODUCT_NAME_INDEX_RECHECK seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rows = {}
+            self.names = []
+            self.keys = []
+            self.checked_at = None
+            self.checked_clock = 0.0
+
+    @property
+    def built(self):
+        return self.checked_at is not None
+
+    def warm(self):
+        """Build at worker startup; if the database isn't ready yet the first search builds instead."""
+        if not settings.PRODUCT_NAME_INDEX:
+            return
+        try:
+            self.build()
+        except DatabaseError:
+            self.reset()
+
+    def build(self):
+        with self._lock:
+            self.reset()
+            checked_at = timezone.now() - SYNC_OVERLAP
+            products = Product.objects.filter(active=True).order_by('pk').values_list('pk', 'name', 'price')
+            for pk, name, price in products:
+                self.rows[pk] = (name, _price.to_representation(price))
+                folded, keys = index_keys(pk, name)
+                self.names.append((folded, pk))
+                self.keys.extend((key, pk) for key in keys)
+            self.names.sort()
+            self.keys.sort()
+            self._checked(checked_at)
+
+    def refresh(self):
+        """Apply rows changed and deleted since the last check: two queries on updated_at/deleted_at indexes."""
+        with self._lock:
+            checked_at = timezone.now() - SYNC_OVERLAP
+            for product in Product.objects.filter(updated_at__gte=self.checked_at):
+                self.put(product)
+            deleted = Tombstone.objects.filter(table=table_label(Product), deleted_at__gte=self.checked_at)
+            for object_id in deleted.values_list('object_id', flat=True):
+                self.discard(int(object_id))
+            self._checked(checked_at)
+
+    def _checked(self, checked_at):
+        self.checked_at = checked_at
+        self.checked_clock = time.monotonic()
+
+    def ensure_current(self):
+        with self._lock:
+            if not self.built:
+                self.build()
+            elif time.monotonic() - self.checked_clock >= settings.PRODUCT_NAME_INDEX_RECHECK:
+                self.refresh()
+
+    def put(self, product):
+        with self._lock:
+            self.discard(product.pk)
+            if not product.active:
+                return
+            self.rows[product.pk] = (product.name, _price.to_representation(product.price))
+            name, keys = index_keys(product.pk, product.name)
+            insort(self.names, (name, product.pk))
+            for key in keys:
+                insort(self.keys, (key, product.pk))
+
+    def discard(self, pk):
+        with self._lock:
+            row = self.rows.pop(pk, None)
+            if row is None:
+                return
+            name, keys = index_keys(pk, row[0])
+            _remove(self.names, (name, pk))
+            for key in keys:
+                _remove(self.keys, (key, pk))
+
+    def search(self, text, limit):
+        """
+        Up to ``limit`` products as ProductOptionSerializer rows: an exact id first, then names
+        starting with ``text`` (alphabetically, so an exact name leads), then names with a later
+        word starting with it and ids starting with it.
+        """
+        text = text.strip().casefold()
+        if not text:
+            return []
+        self.ensure_current()
+        with self._lock:
+            found = [int(text)] if text.isdigit() and int(text) in self.rows else []
+            for entries in (self.names, self.keys):
+                position = bisect_left(entries, (text,))
+                while len(found) < limit and position < len(entries) and entries[position][0].startswith(text):
+                    if entries[position][1] not in found:
+                        found.append(entries[position][1])
+                    position += 1
+            return [{'id': pk, 'name': self.rows[pk][0], 'price': self.rows[pk][1]} for pk in found]
+
+    def stats(self):
+        """Size of the index, with the footprint scaled to 100k products for capacity planning."""
+        with self._lock:
+            size = _deep_size([self.rows, self.names, self.keys])
+            return {
+                'products': len(self.rows),
+                'keys': len(self.names) + len(self.keys),
+                'bytes': size,
+                'bytes_per_100k_products': size * 100_000 // len(self.rows) if self.rows else 0,
+            }
+
+
+def _remove(entries, entry):
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+def _deep_size(obj, seen=None):
+    """sys.getsizeof over containers and their contents, counting shared objects once."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
+
+
+product_names = ProductNameIndex()
@@ -1,18 +1,31 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 from rest_framework.routers import DefaultRouter
 
 urlpatterns = [
     path('products/', views.ProductListCreateAPIView.as_view()),
     # path('products/all',views.ProductListAPIView.as_view()),
     path('products/info/', views.ProductInfoAPIView.as_view()),
+    path('products/autocomplete/', views.ProductAutocompleteAPIView.as_view()),
+    path('products/bulk/', views.ProductBulkImportAPIView.as_view()),
+    path('products/export/', views.ProductExportAPIView.as_view()),
     path('products/<int:product_id>/', views.ProductDetailAPIView.as_view()),
+    path('cache/stats/', views.CacheStatsAPIView.as_view()),
+    path('metrics/', views.MetricsAPIView.as_view()),
+    path('dashboard/', views.DashboardAPIView.as_view()),
+    path('sync/', views.SyncAPIView.as_view()),
+    # Async (ASGI) read paths; same responses as their synchronous counterparts above.
+    path('async/products/', async_views.product_list),
+    path('async/products/<int:product_id>/', async_views.product_detail),
+    path('async/orders/', async_views.order_list),
+    path('async/dashboard/', async_views.dashboard),
     # path('orders/', views.OrderListAPIView.as_view()),
     # path('user-orders/', views.UserOrderListAPIView.as_view(), name='user-orders'),
     # path('monthly-revenue/', views.MonthlyRevenueView.as_view(), name='monthly-revenue'),
 ]
 
 router = DefaultRouter()
+router.APIRootView = views.APIRootView
 router.register('orders', views.OrderViewSet)
 router.register('users', views.UserViewSet, basename='user')
 router.register('customers', views.CustomerViewSet, basename='customer')
@@ -1,35 +1,70 @@
-from django.db.models import Max
+import csv
+
+from django.db.models import Avg, Count, Max, Min, Q
+from django.http import StreamingHttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 # from django.views.decorators.cache import cache_page
-from api.serializers import ProductSerializer, OrderSerializer, ProductInfoSerializer, OrderCreateSerializer,ProductSalesSerializer,CustomerSerializer
-from api.models import Product, Order, OrderItem,Customer
+from api.serializers import ProductSerializer, OrderSerializer, ProductInfoSerializer, OrderCreateSerializer,ProductSalesSerializer,CustomerSerializer,OrderSummarySerializer,OrderBulkSerializer,CustomerOptionSerializer,ProductOptionSerializer
+from api.models import Product, Order, OrderItem,Customer,MonthlyRevenue
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from rest_framework import generics ,viewsets
+from rest_framework import generics ,viewsets, status
 from django.views.decorators.vary import vary_on_headers
 from rest_framework.views import APIView
 from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.permissions import (
+    BasePermission,
     IsAuthenticated,
     IsAdminUser,
     AllowAny
 )
 from django.db.models import F, Sum, DecimalField, ExpressionWrapper
-from rest_framework import filters
+from rest_framework import filters, routers
 from django_filters.rest_framework import DjangoFilterBackend
-from api.filter import ProductFilter,InStockFilterBackend, OrderFilter
+from api.filter import ProductFilter,InStockFilterBackend, OrderFilter, requested_period
+from api.bulk import (
+    IMPORT_FORMATS,
+    ORDER_BATCH_LIMIT,
+    create_orders,
+    export_csv,
+    export_ndjson,
+    import_products,
+    read_csv,
+    read_ndjson,
+)
+from api.dashboard import build_dashboard, dashboard_etag
+from api.search import AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT, IndexedSearchFilter, customer_search, product_search
+from api.sync import resolve_tables, sync_changes
+from api.typeahead import product_names
+from api.metrics import request_metrics
+from api.rollups import TOP_SELLING_WINDOWS, monthly_revenue_series, top_selling_products
+from api.cache import CachedListMixin, ConditionalGetMixin, order_cache, product_cache
+from api.budgets import QueryBudget
+from api.compiled import FastListMixin, iter_serialized
+from api.renderers import STREAM_CHUNK_SIZE, StreamingJSONResponse
 from rest_framework.pagination import PageNumberPagination, LimitOffsetPagination
+from api.pagination import OrderPagination, SelectablePagination
 from django.contrib.auth import get_user_model
 from .serializers import UserSerializer
 from rest_framework.response import Response
 from django.db.models.functions import TruncMonth
-from django.utils.dateformat import DateFormat
 
 User = get_user_model()
 
+
+class APIRootView(routers.APIRootView):
+    query_budget = QueryBudget(0)
+
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    query_budget = {'list': QueryBudget(2), 'retrieve': QueryBudget(1)}
 
     def get_permissions(self):
         if self.action in ['create']:
@@ -58,28 +93,29 @@ class UserViewSet(viewsets.ModelViewSet):
     
 
 
-class ProductListCreateAPIView(generics.ListCreateAPIView):
+class ProductListCreateAPIView(ConditionalGetMixin, CachedListMixin, FastListMixin, generics.ListCreateAPIView):
+    list_cache = product_cache
+    conditional_caches = (product_cache,)
     queryset = Product.objects.order_by('pk')
     serializer_class = ProductSerializer
+    # The validators' newest-write lookup, then count and page.
+    query_budget = {'get': QueryBudget(3)}
     filterset_class = ProductFilter
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        IndexedSearchFilter,
         filters.OrderingFilter,
         # InStockFilterBackend
     ]
     search_fields = ['id', 'name']
+    search_index = product_search
     ordering_fields = ['name', 'price', 'stock']
-    pagination_class = PageNumberPagination
+    pagination_class = SelectablePagination
     # pagination_class.page_size = 2
     # pagination_class.page_query_param = 'pagenum'
     # pagination_class.page_size_query_param = 'size'
     # pagination_class.max_page_size = 4
 
-    # @method_decorator(cache_page(60 * 15, key_prefix='product_list'))
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
-    
     # def get_queryset(self):
     #     import time
     #     time.sleep(2)
@@ -93,10 +129,42 @@ class ProductListCreateAPIView(generics.ListCreateAPIView):
         return super().get_permissions()
 
 
-class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+def autocomplete_limit(request):
+    limit = request.query_params.get('limit', str(AUTOCOMPLETE_LIMIT))
+    if not limit.isdigit() or not 1 <= int(limit) <= AUTOCOMPLETE_MAX_LIMIT:
+        raise ValidationError({'limit': f'Must be between 1 and {AUTOCOMPLETE_MAX_LIMIT}.'})
+    return int(limit)
+
+
+def autocomplete_response(request, index, serializer_class, namespace):
+    """Ranked, capped name matches for ``?q=`` (``?limit=`` up to AUTOCOMPLETE_MAX_LIMIT), cached per input."""
+    text = request.query_params.get('q', '')
+    limit = autocomplete_limit(request)
+    key = namespace.make_key('autocomplete', {'q': text.strip().lower(), 'limit': limit}, index.table)
+    data, state = namespace.get_or_refresh(
+        key, lambda: serializer_class(index.autocomplete(text, limit), many=True).data
+    )
+    return Response(data, headers={'X-Cache': state})
+
+
+class ProductAutocompleteAPIView(APIView):
+    """With PRODUCT_NAME_INDEX on, answered from this worker's in-memory index of active products."""
+    permission_classes = [AllowAny]
+    query_budget = QueryBudget(3)
+
+    def get(self, request):
+        if settings.PRODUCT_NAME_INDEX:
+            limit = autocomplete_limit(request)
+            return Response(product_names.search(request.query_params.get('q', ''), limit))
+        return autocomplete_response(request, product_search, ProductOptionSerializer, product_cache)
+
+
+class ProductDetailAPIView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    conditional_caches = (product_cache,)
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     lookup_url_kwarg = 'product_id'
+    query_budget = {'get': QueryBudget(2)}
 
     def get_permissions(self):
         self.permission_classes = [AllowAny]
@@ -109,19 +177,81 @@ class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
 
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.prefetch_related('item__product')
+class ProductBulkImportAPIView(APIView):
+    """
+    POST a CSV (text/csv, with a header row) or NDJSON (application/x-ndjson) body of products.
+    The body is read line by line and written in chunks; see api.bulk.import_products.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        content_type = request.content_type.split(';')[0].strip().lower()
+        if content_type not in IMPORT_FORMATS:
+            raise UnsupportedMediaType(content_type)
+        lines = request.stream or []
+        reader = read_csv if IMPORT_FORMATS[content_type] == 'csv' else read_ndjson
+        try:
+            result = import_products(reader(lines))
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ValidationError({'detail': f'Could not parse the upload: {exc}'})
+        return Response(result)
+
+
+class ProductExportAPIView(APIView):
+    """
+    Streams every product matching the ProductFilter parameters as CSV, or NDJSON with
+    ``?type=ndjson``, without loading the queryset into memory.
+    """
+    permission_classes = [AllowAny]
+    query_budget = QueryBudget(0)  # the rows are read as the body streams
+
+    def get(self, request):
+        filterset = ProductFilter(request.query_params, queryset=Product.objects.order_by('pk'))
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        if request.query_params.get('type', 'csv') == 'ndjson':
+            content_type, rows, extension = 'application/x-ndjson', export_ndjson(filterset.qs), 'ndjson'
+        else:
+            content_type, rows, extension = 'text/csv', export_csv(filterset.qs), 'csv'
+        response = StreamingHttpResponse(rows, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{extension}"'
+        return response
+
+
+class OrderViewSet(ConditionalGetMixin, CachedListMixin, FastListMixin, viewsets.ModelViewSet):
+    list_cache = order_cache
+    conditional_caches = (order_cache,)
+    cache_per_user = True
+    extra_cache_params = ('view',)
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [AllowAny]
-    pagination_class = LimitOffsetPagination
+    query_budget = {
+        'list': QueryBudget(9),
+        'retrieve': QueryBudget(8),
+        'month_revenue': QueryBudget(1),
+        'monthly_revenue': QueryBudget(1),
+        'top_selling': QueryBudget(2),
+    }
+    pagination_class = OrderPagination
     filterset_class = OrderFilter
     filter_backends = [DjangoFilterBackend]
     lookup_field = 'order_id'
 
-    # @method_decorator(cache_page(60 * 1, key_prefix='order_list'))
-    # @method_decorator(vary_on_headers("Authorization"))
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    list_views = ('full', 'summary', 'count')
+
+    def uncached_list(self, request, *args, **kwargs):
+        if self.get_list_view() == 'count':
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response({'count': queryset.count()})
+        return super().uncached_list(request, *args, **kwargs)
+
+    def get_list_view(self):
+        """Response shape requested through ``?view=``: full rows, flat summaries or just the count."""
+        list_view = self.request.query_params.get('view', 'full')
+        if list_view not in self.list_views:
+            raise ValidationError({'view': f"Must be one of: {', '.join(self.list_views)}."})
+        return list_view
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -137,63 +267,68 @@ class OrderViewSet(viewsets.ModelViewSet):
     #     self.perform_update(serializer)
     #     return Response(serializer.data)    
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        list_view = self.get_list_view() if self.action == 'list' else None
+        if list_view == 'summary':
+            queryset = OrderSummarySerializer.setup_eager_loading(queryset)
+        elif list_view == 'full' or self.action == 'retrieve':
+            queryset = OrderSerializer.setup_eager_loading(queryset)
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ['update', 'create','partial_update']:
             return OrderCreateSerializer
+        if self.action == 'list' and self.get_list_view() == 'summary':
+            return OrderSummarySerializer
         return super().get_serializer_class()
 
+    @action(detail=False, methods=['post'], url_path='bulk', permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """Create up to ORDER_BATCH_LIMIT orders, each shaped like a POST to /orders/, in one transaction."""
+        serializer = OrderBulkSerializer(data=request.data, many=True, max_length=ORDER_BATCH_LIMIT)
+        serializer.is_valid(raise_exception=True)
+        orders = create_orders(request.user, serializer.validated_data)
+        return Response(
+            [
+                {'order_id': order.order_id, 'total_price': order.total_price, 'total_quantity': order.total_quantity}
+                for order in orders
+            ],
+            status=status.HTTP_201_CREATED,
+        )
+
     @action(detail=False, methods=['get'], url_path='month-revenue')
     def month_revenue(self, request):
-        
-        filtered_orders = OrderFilter(request.GET, queryset=self.get_queryset()).qs
+        filterset = OrderFilter(request.GET, queryset=self.get_queryset())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        # Calendar periods are answered from the rollup; any other filter needs the orders table.
+        if set(request.GET) <= {'month', 'year'}:
+            rollup = MonthlyRevenue.objects.all()
+            period = requested_period(filterset.form.cleaned_data)
+            if period is not None:
+                rollup = rollup.filter(month__gte=period[0], month__lt=period[1])
+            revenue = rollup.aggregate(revenue=Sum('revenue'))['revenue'] or 0
+            return Response({'total_revenue': revenue})
 
-        revenue = OrderItem.objects.filter(order__in=filtered_orders).aggregate(
-            revenue=Sum(
-                ExpressionWrapper(
-                    F('product__price') * F('quantity'),
-                    output_field=DecimalField()
-                )
-            )
-        )['revenue'] or 0
+        revenue = filterset.qs.aggregate(revenue=Sum('total_price'))['revenue'] or 0
 
         return Response({'total_revenue': revenue})
     @action(detail=False, methods=['get'], url_path='top-selling')
     def top_selling(self, request):
-        top_products = (
-            Product.objects
-            .annotate(total_sold=Sum('orderitem__quantity'))
-            .order_by('-total_sold')[:5]
-        )
+        days = request.GET.get('days')
+        if days is not None:
+            if days not in {str(window) for window in TOP_SELLING_WINDOWS}:
+                raise ValidationError({'days': f"Must be one of: {', '.join(map(str, TOP_SELLING_WINDOWS))}."})
+            days = int(days)
+        top_products = top_selling_products(limit=5, days=days)
         serializer = ProductSalesSerializer(top_products, many=True)
         return Response(serializer.data)
        
     @action(detail=False, methods=['get'], url_path='monthly-revenue')
     def monthly_revenue(self, request):
-      
-        revenue_qs = (
-            Order.objects
-            .annotate(month=TruncMonth('created_at'))
-            .values('month')
-            .annotate(
-                total_revenue=Sum(
-                    ExpressionWrapper(
-                        F('item__product__price') * F('item__quantity'),
-                        output_field=DecimalField()
-                    )
-                )
-            )
-            .order_by('month')
-        )
-
-        result = [
-            {
-                'label': DateFormat(entry['month']).format('M Y'),
-                'value': entry['total_revenue'] or 0
-            }
-            for entry in revenue_qs
-        ]
-
-        return Response(result)
+        return Response(monthly_revenue_series())
     
 
     # def get_queryset(self):
@@ -203,25 +338,133 @@ class OrderViewSet(viewsets.ModelViewSet):
     #     return qs 
     
  
-class ProductInfoAPIView(APIView):
+class CacheStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    query_budget = QueryBudget(0)
+
     def get(self, request):
-        products = Product.objects.all()
-        serializer = ProductInfoSerializer({
-            'products': products,
-            'count': len(products),
-            'max_price': products.aggregate(max_price=Max('price'))['max_price']
-        })
-        return Response(serializer.data)
-    
+        stats = {namespace.namespace: namespace.stats() for namespace in (product_cache, order_cache)}
+        if settings.PRODUCT_NAME_INDEX:
+            stats['product_names'] = product_names.stats()
+        return Response(stats)
+
+
+class IsAdminOrMetricsToken(BasePermission):
+    """Staff, or a scraper sending METRICS_TOKEN (when one is configured) as X-Metrics-Token."""
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        if token and constant_time_compare(request.headers.get('X-Metrics-Token', ''), token):
+            return True
+        return IsAdminUser().has_permission(request, view)
+
+
+class MetricsAPIView(APIView):
+    """
+    This worker's request metrics since it started or was last reset (DELETE): per endpoint,
+    sampled requests with their latency histogram and percentiles, queries and database time.
+    """
+    permission_classes = [IsAdminOrMetricsToken]
+    query_budget = QueryBudget(0)
+
+    def get(self, request):
+        return Response(request_metrics.snapshot())
+
+    def delete(self, request):
+        request_metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProductInfoAPIView(CachedListMixin, generics.GenericAPIView):
+    """
+    Catalogue statistics from a single aggregate query. ``?embed=products`` adds one page of
+    products, paginated like /products/. Cached until the next product write.
+
+    ``?embed=all`` adds the whole catalogue instead, streamed: products are fetched, serialized
+    and written STREAM_CHUNK_SIZE at a time, and that response is never cached.
+    """
+    list_cache = product_cache
+    extra_cache_params = ('embed',)
+    query_budget = QueryBudget(3)
+    queryset = Product.objects.order_by('pk')
+    serializer_class = ProductSerializer
+    pagination_class = SelectablePagination
+    low_stock_threshold = 5  # what the dashboard's low-stock list uses (?stock__lt=5)
+
+    def get(self, request, *args, **kwargs):
+        if request.query_params.get('embed') == 'all':
+            products = iter_serialized(self.get_serializer_class(), self.get_queryset(), STREAM_CHUNK_SIZE)
+            return StreamingJSONResponse({**ProductInfoSerializer(self.aggregate()).data, 'products': products})
+        return self.list(request, *args, **kwargs)
+
+    def aggregate(self):
+        return self.get_queryset().aggregate(
+            count=Count('pk'),
+            max_price=Max('price'),
+            min_price=Min('price'),
+            avg_price=Avg('price'),
+            stock_value=Sum(F('price') * F('stock'), output_field=DecimalField()),
+            low_stock_count=Count('pk', filter=Q(stock__lt=self.low_stock_threshold)),
+        )
+
+    def uncached_list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        info = self.aggregate()
+        if request.query_params.get('embed') == 'products':
+            page = self.paginate_queryset(queryset)
+            info['products'] = self.get_paginated_response(self.get_serializer(page, many=True).data).data
+        return Response(ProductInfoSerializer(info).data)
+
+
+class DashboardAPIView(APIView):
+    """
+    Every figure on the dashboard page in one response. The ETag only changes with product
+    or order writes, so a revalidation with If-None-Match is a 304 that touches no table.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = QueryBudget(7)
+
+    @method_decorator(condition(etag_func=lambda request, *args, **kwargs: dashboard_etag()))
+    def get(self, request):
+        etag = dashboard_etag()
+        key = f'dashboard:{etag}'
+        data = cache.get(key)
+        if data is None:
+            data = build_dashboard()
+            cache.set(key, data, settings.API_CACHE_TIMEOUT)
+        return Response(data)
+
+
+class SyncAPIView(APIView):
+    """
+    Streams rows changed since ``?since=<token>`` as NDJSON (everything when omitted), limited
+    to ``?tables=products,orders`` if given. The last line carries the next token.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = QueryBudget(0)  # the changes are read as the body streams
+
+    def get(self, request):
+        lines = sync_changes(
+            since=request.query_params.get('since'),
+            tables=resolve_tables(request.query_params.get('tables')),
+        )
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
 # from django.contrib.auth.models import AnonymousUser
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
+    # Customers embed their orders, and order_cache moves with customer and order writes alike.
+    conditional_caches = (order_cache,)
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [AllowAny]
+    query_budget = {'list': QueryBudget(7), 'retrieve': QueryBudget(5), 'autocomplete': QueryBudget(3)}
+    pagination_class = SelectablePagination
     search_fields = ['id', 'name']
+    search_index = customer_search
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        IndexedSearchFilter,
     ]
 
     # def perform_create(self, serializer):
@@ -231,5 +474,16 @@ class CustomerViewSet(viewsets.ModelViewSet):
     #     else:
     #         serializer.save(created_by=user)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = CustomerSerializer.setup_eager_loading(queryset)
+        return queryset
+
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
\ No newline at end of file
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        # Customer writes retire order_cache too, which is what these results depend on.
+        return autocomplete_response(request, customer_search, CustomerOptionSerializer, order_cache)
\ No newline at end of file
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drf_course.settings')
 
 application = get_asgi_application()
+
+from api.typeahead import product_names  # noqa: E402 (needs the app registry)
+
+product_names.warm()
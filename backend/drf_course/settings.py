@@ -45,7 +45,13 @@ INSTALLED_APPS = [
     "corsheaders",
 ]
 
+# Silk's middleware is sync-only, so under ASGI it makes Django run the stack around it in
+# threads; it is left out unless profiling is wanted (by default only with DEBUG).
+SILK_PROFILING = os.environ.get("SILK_PROFILING", str(DEBUG)) == "True"
+
 MIDDLEWARE = [
+    # First, so it times the whole stack; see METRICS_SAMPLE_RATE.
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,7 +59,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'silk.middleware.SilkyMiddleware',
+    # Only records the requests SILKY_INTERCEPT_FUNC picks out.
+    *(['silk.middleware.SilkyMiddleware'] if SILK_PROFILING else []),
+    # Inside silk, so silk's own bookkeeping queries aren't charged to the views.
+    'api.budgets.QueryBudgetMiddleware',
     "corsheaders.middleware.CorsMiddleware",  
     "django.middleware.common.CommonMiddleware",
    
@@ -156,6 +165,12 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    # FastJSONRenderer encodes with orjson when it is installed (same bytes as JSONRenderer);
+    # API_JSON_RENDERER=rest_framework.renderers.JSONRenderer puts the stdlib encoder back.
+    'DEFAULT_RENDERER_CLASSES': [
+        os.environ.get('API_JSON_RENDERER', 'api.renderers.FastJSONRenderer'),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -182,6 +197,47 @@ SPECTACULAR_SETTINGS = {
 }
 
 
+# LocMem by default; point CACHE_BACKEND/CACHE_LOCATION at a file or shared cache in deployments.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "inventory"),
+    }
+}
+
+# Seconds a cached API response may live; writes invalidate earlier through api.cache.
+API_CACHE_TIMEOUT = int(os.environ.get("API_CACHE_TIMEOUT", 60 * 15))
+
+# Days of deletions /sync/ can replay; older sync tokens must start over. See prune_tombstones.
+SYNC_TOMBSTONE_DAYS = int(os.environ.get("SYNC_TOMBSTONE_DAYS", 30))
+
+# Answer /products/autocomplete/ from an in-process index (api.typeahead) instead of the database,
+# checking for other workers' writes at most every PRODUCT_NAME_INDEX_RECHECK seconds.
+PRODUCT_NAME_INDEX = os.environ.get("PRODUCT_NAME_INDEX", "False") == "True"
+PRODUCT_NAME_INDEX_RECHECK = float(os.environ.get("PRODUCT_NAME_INDEX_RECHECK", 5))
+
+# Render product, order and customer lists from .values() rows through compiled serializers (api.compiled).
+FAST_SERIALIZERS = os.environ.get("FAST_SERIALIZERS", "False") == "True"
+
+# Check each request against its view's query_budget (api.budgets): "warn" logs overruns, "raise"
+# fails the request, "off" skips the measuring. QUERY_BUDGET_DB_MS is the default database time limit.
+QUERY_BUDGETS = os.environ.get("QUERY_BUDGETS", "warn" if DEBUG else "off")
+QUERY_BUDGET_DB_MS = float(os.environ.get("QUERY_BUDGET_DB_MS", 250))
+
+# Request metrics (api.metrics, served at /metrics/ to staff): the share of requests timed, how
+# many endpoints get their own histogram, and a token a scraper can send as X-Metrics-Token instead.
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", 1.0 if DEBUG else 0.1))
+METRICS_MAX_ENDPOINTS = int(os.environ.get("METRICS_MAX_ENDPOINTS", 200))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+
+# Silk writes every request and query it records to the database, so it only records staff
+# requests sent with "X-Silk-Profile: 1" instead of all of them.
+def SILKY_INTERCEPT_FUNC(request):
+    from api.metrics import silk_requested
+    return silk_requested(request)
+
+
 # CACHES = {
 #     "default": {
 #         "BACKEND": "django_redis.cache.RedisCache",
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drf_course.settings')
 
 application = get_wsgi_application()
+
+from api.typeahead import product_names  # noqa: E402 (needs the app registry)
+
+product_names.warm()
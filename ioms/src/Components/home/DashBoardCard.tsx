@@ -1,47 +1,15 @@
 import type {FC} from 'react';  
-import {useState,useEffect} from 'react';
-import { Order_This_Month,Revenue_This_Month,Active_Product } from '../../services/api';
 import Card from '@mui/material/Card';
 
 
-
+interface DashBoardCardProps {
+    orderCount: number;
+    revenueThisMonth: number;
+    activeProducts: number;
+    totalCustomers: number;
+}
   
-const DashBoardCard: FC = () => {
-    const [orderCount, setOrderCount] = useState<number>(0);
-    const [revenueThisMonth, setRevenueThisMonth] = useState<number>(0);
-    const [activeProducts, setActiveProducts] = useState<number>(0);
-    const [totalCustomers, _] = useState<number>(0);
-
-    useEffect(() => {
-      const fetchOrder = async () => {
-        try {
-          const data = await Order_This_Month();
-          setOrderCount(data.count);
-        } catch (error) {
-          console.error('Failed to fetch order count:', error);
-        }
-      };
-      const fetchRevenue = async () => {
-        try {
-          const data = await Revenue_This_Month();
-          setRevenueThisMonth(data.total_revenue);
-        } catch (error) {
-          console.error('Failed to fetch order count:', error);
-        }
-      };
-      const fetch_Active_Product = async () => {
-        try {
-          const data = await Active_Product();
-          setActiveProducts(data.count);
-        } catch (error) {
-          console.error('Failed to fetch order count:', error);
-        }
-      };
-
-      fetch_Active_Product();
-      fetchRevenue();
-      fetchOrder();
-    }, []);
+const DashBoardCard: FC<DashBoardCardProps> = ({ orderCount, revenueThisMonth, activeProducts, totalCustomers }) => {
     return(
 <div className="flex flex-col items-start gap-12">
   <Card className="p-4 shadow w-64 h-full">
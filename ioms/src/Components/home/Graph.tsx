@@ -1,24 +1,8 @@
-import { useEffect, useState } from 'react';
 import { ScatterChart } from '@mui/x-charts/ScatterChart';
 import { PieChart } from '@mui/x-charts/PieChart';
-import { fetchMonthlyRevenue } from '../../services/api'; 
 import type { MonthlyRevenue } from '../../interface/interface'; 
 
-const Graph = () => {
-  const [data, setData] = useState<MonthlyRevenue[]>([]);
-
-  useEffect(() => {
-    const loadData = async () => {
-      try {
-        const result = await fetchMonthlyRevenue();
-        setData(result);
-      } catch (error) {
-        console.error('Failed to fetch revenue data', error);
-      }
-    };
-
-    loadData();
-  }, []);
+const Graph = ({ data }: { data: MonthlyRevenue[] }) => {
 
   return (
     <div style={{ display: 'flex', gap: '4rem', alignItems: 'center' }}>
@@ -1,9 +1,8 @@
-import React, { useEffect, useState } from 'react';
+import React from 'react';
 import {
   Table, TableBody, TableCell, TableContainer,
-  TableHead, TableRow, Paper, Typography, CircularProgress
+  TableHead, TableRow, Paper, Typography
 } from '@mui/material';
-import { fetchLowStock } from '../../services/api'; 
 
 
 export interface Low_Stock {
@@ -15,29 +14,7 @@ export interface Low_Stock {
     active: boolean;
   }
 
-const LowStock: React.FC = () => {
-  const [data, setData] = useState<Low_Stock[]>([]);
-  const [loading, setLoading] = useState<boolean>(true);
-
-  useEffect(() => {
-    const fetchLowStock_ = async () => {
-      try {
-        const response = await fetchLowStock();
-        setData(response);
-      } catch (error) {
-        console.error('Error fetching low stock products', error);
-      } finally {
-        setLoading(false);
-      }
-    };
-
-    fetchLowStock_();
-  }, []);
-
-  if (loading) {
-    return <CircularProgress />;
-  }
-
+const LowStock: React.FC<{ data: Low_Stock[] }> = ({ data }) => {
   return (
     <TableContainer component={Paper} sx={{ maxWidth: 1000, height: 'full',  }}>
       <Typography variant="h6" align="center" gutterBottom sx={{ color: data.length === 0 ? 'red' : 'inherit', marginTop:3, fontWeight: 'bold'}}>
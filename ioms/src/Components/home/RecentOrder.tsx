@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React from 'react';
 import {
   Table,
   TableBody,
@@ -8,52 +8,12 @@ import {
   TableRow,
   Paper,
   Typography,
-  CircularProgress,
-  Box,
   Tooltip
 } from '@mui/material';
 
-import { fetchRecentOrders } from '../../services/api';
 import type { Order } from '../../interface/interface';
 
-const RecentOrders: React.FC = () => {
- 
-  const [orders, setOrders] = useState<Order[]>([]);
-  const [loading, setLoading] = useState<boolean>(true);
-  const [error, setError] = useState<string | null>(null);
-
-  useEffect(() => {
-    const loadRecentOrders = async () => {
-      try {
-        const response = await fetchRecentOrders();
-        setOrders(response);
-      } catch (err) {
-        console.error('Error fetching recent orders', err);
-        setError('Failed to load recent orders.');
-      } finally {
-        setLoading(false);
-      }
-    };
-
-    loadRecentOrders();
-  }, []); 
-
-  if (loading) {
-    return (
-      <Box sx={{ display: 'flex', justifyContent: 'center', alignItems: 'center', height: 200 }}>
-        <CircularProgress />
-      </Box>
-    );
-  }
-  
-  if (error) {
-    return (
-        <Typography color="error" align="center" sx={{ mt: 4 }}>
-          {error}
-        </Typography>
-    );
-  }
-
+const RecentOrders: React.FC<{ orders: Order[] }> = ({ orders }) => {
   return (
     <TableContainer component={Paper} sx={{ maxWidth: 'full', height: 'full' }}>
       <Typography 
@@ -1,9 +1,8 @@
-import React, { useEffect, useState } from 'react';
+import React from 'react';
 import {
   Table, TableBody, TableCell, TableContainer,
-  TableHead, TableRow, Paper, CircularProgress, Typography
+  TableHead, TableRow, Paper, Typography
 } from '@mui/material';
-import { Top_Products } from '../../services/api';
 
 
 interface TopProduct {
@@ -12,29 +11,7 @@ interface TopProduct {
   price: number;
   total_sold: number;
   }
-const TopSelling: React.FC = () => {
-  const [products, setProducts] = useState<TopProduct[]>([]);
-  const [loading, setLoading] = useState<boolean>(true);
-  const [error, setError] = useState<string | null>(null);
-
-  useEffect(() => {
-    const fetchTopProducts = async () => {
-      try {
-        const data = await Top_Products();
-        setProducts(data);
-      } catch (err) {
-        setError('Failed to load top products');
-      } finally {
-        setLoading(false);
-      }
-    };
-
-    fetchTopProducts();
-  }, []);
-
-  if (loading) return <CircularProgress />;
-  if (error) return <Typography color="error">{error}</Typography>;
-
+const TopSelling: React.FC<{ products: TopProduct[] }> = ({ products }) => {
   return (
     
     
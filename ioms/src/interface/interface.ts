@@ -170,6 +170,18 @@ export interface OrderItemId {
 
 
 
+  export interface DashboardData {
+    orders_this_month: number;
+    revenue_this_month: number;
+    active_products: number;
+    total_customers: number;
+    low_stock_count: number;
+    low_stock: Low_Stock[];
+    top_selling: top_products[];
+    recent_orders: Order[];
+    monthly_revenue: MonthlyRevenue[];
+  }
+
   export interface ApiError {
     response?: {
       data?: {
@@ -1,21 +1,42 @@
 import type{ FC } from 'react';
+import { useEffect, useState } from 'react';
+import { Box, CircularProgress, Typography } from '@mui/material';
 import DashBoardCard from '../Components/home/DashBoardCard';
 import Graph from '../Components/home/Graph';
 import TopSelling from '../Components/home/TopProducts';
 import LowStock from '../Components/home/LowStock';
 import RecentOrders from '../Components/home/RecentOrder';
+import { fetchDashboard } from '../services/api';
+import type { DashboardData } from '../interface/interface';
 
 
 
 
 
 const Dashboard: FC = () => {
+  const [data, setData] = useState<DashboardData | null>(null);
+  const [error, setError] = useState<string | null>(null);
 
+  useEffect(() => {
+    fetchDashboard()
+      .then(setData)
+      .catch((err) => {
+        console.error('Failed to load the dashboard', err);
+        setError('Failed to load the dashboard.');
+      });
+  }, []);
 
+  if (error) {
+    return <Typography color="error" align="center" sx={{ mt: 4 }}>{error}</Typography>;
+  }
 
-
-
-  
+  if (!data) {
+    return (
+      <Box sx={{ display: 'flex', justifyContent: 'center', alignItems: 'center', height: 200 }}>
+        <CircularProgress />
+      </Box>
+    );
+  }
 
   return (
     <div className="p-4">
@@ -24,7 +45,12 @@ const Dashboard: FC = () => {
       <div className="grid grid-cols-1 lg:grid-cols-[300px_1fr] gap-4 items-stretch">
 
   <div className="h-full">
-    <DashBoardCard />
+    <DashBoardCard
+      orderCount={data.orders_this_month}
+      revenueThisMonth={data.revenue_this_month}
+      activeProducts={data.active_products}
+      totalCustomers={data.total_customers}
+    />
   </div>
 
 
@@ -32,17 +58,17 @@ const Dashboard: FC = () => {
     <div className="shadow p-4 bg-white rounded h-full flex flex-col">
       <h2 className="text-xl font-semibold mb-2">Monthly Revenue</h2>
       <div className="flex-1">
-        <Graph/>
+        <Graph data={data.monthly_revenue}/>
       </div>
     </div>
   </div>
 </div>
 <div className="grid grid-cols-1 lg:grid-cols-2 gap-6 mt-11">
-<TopSelling />
-<LowStock />
+<TopSelling products={data.top_selling} />
+<LowStock data={data.low_stock} />
   </div>
   <div className='mt-6 w-[100%]'>
-  <RecentOrders/>
+  <RecentOrders orders={data.recent_orders}/>
   </div>
 </div>
     
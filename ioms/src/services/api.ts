@@ -3,7 +3,7 @@ import axios from 'axios';
 import type{ AxiosError, InternalAxiosRequestConfig } from 'axios';
 
 import { API_URL } from '../config';
-import type{SignUpData,SignInCredentials,AuthResponse,Order_count,Order_Revenue,ActiveProduct,top_products,Low_Stock,PaginatedLowStockResponse,Order,OrderListResponse,MonthlyRevenue,Customer,CreateCustomerData,CustomerFormData,PaginatedCustomerResponse,PaginatedOrderResponse,ProductInfo,PaginatedProductResponse} from '../interface/interface';
+import type{SignUpData,SignInCredentials,AuthResponse,Order_count,Order_Revenue,ActiveProduct,top_products,Low_Stock,PaginatedLowStockResponse,Order,OrderListResponse,MonthlyRevenue,Customer,CreateCustomerData,CustomerFormData,PaginatedCustomerResponse,PaginatedOrderResponse,ProductInfo,PaginatedProductResponse,DashboardData} from '../interface/interface';
 
 
 
@@ -211,9 +211,15 @@ export const signIn = async (credentials: SignInCredentials): Promise<AuthRespon
   return response.data;
 };
 
+// Everything the dashboard shows in one request; the browser revalidates it with its ETag.
+export const fetchDashboard = async (): Promise<DashboardData> => {
+  const response = await api.get<DashboardData>('/dashboard/');
+  return response.data;
+};
+
 export const Order_This_Month = async (): Promise<Order_count> => {
   const currentMonth = new Date().getMonth() + 1; 
-  const response = await api.get<Order_count>(`/orders/?month=${currentMonth}`);
+  const response = await api.get<Order_count>(`/orders/?month=${currentMonth}&view=count`);
   return response.data;
 };
 
@@ -238,7 +244,7 @@ export const fetchLowStock = async (): Promise<Low_Stock[]> => {
 };
 
 export const fetchRecentOrders = async (): Promise<Order[]> => {
-  const response = await api.get<OrderListResponse>('/orders/?recent=true');
+  const response = await api.get<OrderListResponse>('/orders/?recent=true&view=summary');
   return response.data.results;
 };
 
@@ -299,16 +305,17 @@ export const deleteOrder = async (id: string): Promise<void> => {
   await api.delete(`/orders/${id}/`);
 };
 
+// Autocomplete rows are capped and ranked, and leave out the order history.
 export const fetchCustomer = async (search: string = ''): Promise<Customer[]> => {
   
-  const response = await api.get<PaginatedCustomerResponse>(`/customers/?search=${search}`);
-  return response.data.results;
+  const response = await api.get<Customer[]>('/customers/autocomplete/', { params: { q: search } });
+  return response.data;
 };
 
 
 export const fetchProducts = async (search: string = ''): Promise<ProductInfo[]> => {
-  const response = await api.get<PaginatedProductResponse>(`/products/?search=${search}`);
-  return response.data.results; 
+  const response = await api.get<ProductInfo[]>('/products/autocomplete/', { params: { q: search } });
+  return response.data; 
 
 };
 